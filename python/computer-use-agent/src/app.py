@@ -3,14 +3,26 @@ Copyright (c) Microsoft Corporation. All rights reserved.
 Licensed under the MIT License.
 """
 
+import asyncio
+import logging
+from datetime import timedelta
 from http import HTTPStatus
 
 from aiohttp import web
 from botbuilder.core.integration import aiohttp_error_middleware
 
-from bot import bot_app
+from bot import (
+    bot_app,
+    browser_manager,
+    browser_pool,
+    desktop_pool,
+    screenshot_store,
+    session_storage,
+)
 from config import Config
+from cua.client import close_openai_client, setup_openai_client
 
+logger = logging.getLogger(__name__)
 routes = web.RouteTableDef()
 
 
@@ -24,8 +36,54 @@ async def on_messages(req: web.Request) -> web.Response:
     return web.Response(status=HTTPStatus.OK)
 
 
+@routes.get("/api/screenshots/{digest}")
+async def on_screenshot(req: web.Request) -> web.Response:
+    screenshot = screenshot_store.get(
+        req.match_info["digest"], req.query.get("expires"), req.query.get("sig")
+    )
+
+    if screenshot is None:
+        return web.Response(status=HTTPStatus.NOT_FOUND)
+
+    # Screenshots are content addressed, so they never change behind a URL
+    return web.Response(
+        body=screenshot.data,
+        content_type=screenshot.mime_type,
+        headers={"Cache-Control": f"private, max-age={Config.SCREENSHOT_TTL_SECONDS}"},
+    )
+
+
+async def expire_idle_sessions() -> None:
+    """End idle sessions, which gives their browser or desktop back to its pool."""
+    max_idle = timedelta(seconds=Config.SESSION_IDLE_SECONDS)
+    while True:
+        await asyncio.sleep(60)
+        try:
+            await session_storage.expire_idle(max_idle)
+        except Exception as e:
+            logger.warning(f"Failed to expire idle sessions: {e}")
+
+
+async def on_startup(app: web.Application) -> None:
+    setup_openai_client()
+    await browser_pool.start()
+    app["session_expiry"] = asyncio.create_task(expire_idle_sessions())
+
+
+async def on_cleanup(app: web.Application) -> None:
+    app["session_expiry"].cancel()
+    await session_storage.close()
+    await browser_pool.close()
+    await desktop_pool.close()
+    await close_openai_client()
+    if browser_manager is not None:
+        await browser_manager.close()
+
+
 app = web.Application(middlewares=[aiohttp_error_middleware])
 app.add_routes(routes)
+app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
 
 if __name__ == "__main__":
     web.run_app(app, host="0.0.0.0", port=Config.PORT)
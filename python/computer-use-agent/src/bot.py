@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import logging
 import traceback
 
@@ -7,9 +8,19 @@ from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.state import TurnState
 
 from config import Config
-from cua.cua_agent import ComputerUseAgent
+from cua.browser.manager import BrowserManager
+from cua.browser.pool import BrowserPool
+from cua.cua_agent import (
+    ComputerUseAgent,
+    create_browser,
+    create_machine,
+    reset_desktop,
+)
+from cua.vnc.pool import DesktopPool
 from middleware.session_middleware import SessionMiddleware
+from progress import ProgressPublisher
 from storage.cua_session import CuaSession
+from storage.screenshot_store import ScreenshotStore
 from storage.session_storage import SessionStorage
 
 config = Config()
@@ -20,6 +31,37 @@ logging.basicConfig(
 
 # Initialize application with session management
 session_storage = SessionStorage()
+screenshot_store = ScreenshotStore(
+    base_url=config.BOT_ENDPOINT,
+    secret=config.SCREENSHOT_URL_SECRET,
+    ttl_seconds=config.SCREENSHOT_TTL_SECONDS,
+    max_bytes=config.SCREENSHOT_STORE_MAX_BYTES,
+)
+browser_manager = (
+    BrowserManager(
+        max_contexts_per_process=config.BROWSER_CONTEXTS_PER_PROCESS,
+        recycle_after=config.BROWSER_RECYCLE_AFTER,
+    )
+    if config.BROWSER_SHARED_PROCESSES
+    else None
+)
+browser_pool = BrowserPool(
+    factory=functools.partial(create_browser, manager=browser_manager),
+    size=config.BROWSER_POOL_SIZE if config.USE_BROWSER else 0,
+)
+desktop_pool = DesktopPool(
+    config.VNC_ADDRESSES,
+    machine_factory=create_machine,
+    idle_timeout=config.VNC_LEASE_IDLE_SECONDS,
+    acquire_timeout=config.VNC_ACQUIRE_TIMEOUT,
+    reset_desktop=reset_desktop if config.VNC_RESET_COMMAND else None,
+)
+progress_publisher = ProgressPublisher(
+    debounce=config.PROGRESS_DEBOUNCE,
+    min_interval=config.PROGRESS_MIN_INTERVAL,
+    timeout=config.PROGRESS_UPDATE_TIMEOUT,
+    max_backoff=config.PROGRESS_MAX_BACKOFF,
+)
 bot_app = Application(
     ApplicationOptions(
         bot_app_id=config.APP_ID,
@@ -92,7 +134,15 @@ async def run_cua_agent(
     context: TurnContext, session: CuaSession, query: str, activity_id: str | None
 ) -> str:
     """Run the CUA agent with the given query."""
-    cua_agent = ComputerUseAgent(context, session, activity_id)
+    cua_agent = ComputerUseAgent(
+        context,
+        session,
+        activity_id,
+        screenshot_store,
+        browser_pool,
+        desktop_pool,
+        progress_publisher,
+    )
     logger.info(f"Running CUA agent with query: {query}")
     result = await cua_agent.run(query)
     return result
@@ -1,4 +1,4 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 from openai.types.responses.response_computer_tool_call import (
     PendingSafetyCheck,
@@ -6,13 +6,14 @@ from openai.types.responses.response_computer_tool_call import (
 
 
 class ProgressStepDict(TypedDict):
+    step: NotRequired[int]  # The step number, counting from 1
     action: str  # The action type/name
     next_action: str  # What happens next
     message: str  # Any message associated with the step
 
 
 def create_cua_progress_card(
-    screenshot: str = None,
+    screenshot_url: str = None,
     current_step: ProgressStepDict = None,
     history: list[ProgressStepDict] = None,
     status: str = "Running",
@@ -20,11 +21,12 @@ def create_cua_progress_card(
     """Create a progress card showing the current state of the computer use session.
 
     Args:
-        screenshot: Base64 encoded screenshot
+        screenshot_url: URL of the screenshot preview, e.g. a data URL
         current_step: Current step info with format:
                      {"action": str, "next_action": str, "message": str}
         history: List of previous steps with format:
-                [{"action": str, "next_action": str, "message": str}, ...]
+                [{"step": int, "action": str, "next_action": str, "message": str}, ...]
+                The step number is optional and defaults to the position in the list
         status: Current status of the agent (Running/Paused)
     """
     card = {
@@ -92,11 +94,11 @@ def create_cua_progress_card(
         ],
     }
 
-    if screenshot:
+    if screenshot_url:
         card["body"].append(
             {
                 "type": "Image",
-                "url": f"data:image/png;base64,{screenshot}",
+                "url": screenshot_url,
                 "msTeams": {
                     "allowExpand": True,
                 },
@@ -185,7 +187,7 @@ def create_cua_progress_card(
                     "items": [
                         {
                             "type": "TextBlock",
-                            "text": f"Step {i + 1}",
+                            "text": f"Step {step.get('step', i + 1)}",
                             "weight": "Bolder",
                             "size": "Medium",
                             "wrap": True,
@@ -16,6 +16,14 @@ class Config:
     PORT = 3978
     APP_ID = os.environ.get("BOT_ID", "")
     APP_PASSWORD = os.environ.get("BOT_PASSWORD", "")
+    # The public URL of the bot. Card screenshots are served from it when set,
+    # otherwise they are inlined into the cards as data URIs.
+    BOT_ENDPOINT = os.environ.get("BOT_ENDPOINT", None)
+    SCREENSHOT_URL_SECRET = os.environ.get("SCREENSHOT_URL_SECRET", None)
+    SCREENSHOT_TTL_SECONDS = int(os.environ.get("SCREENSHOT_TTL_SECONDS", "900"))
+    SCREENSHOT_STORE_MAX_BYTES = int(
+        os.environ.get("SCREENSHOT_STORE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
 
     # LLM Configuration
     AZURE_OPENAI_API_BASE = os.environ.get("AZURE_OPENAI_ENDPOINT", None)
@@ -24,9 +32,166 @@ class Config:
     AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", None)
     OPENAI_MODEL_NAME = os.environ.get("OPENAI_MODEL_NAME", None)
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", None)
+    # The model client is shared by the whole process. Its connections are kept
+    # alive for OPENAI_KEEPALIVE_EXPIRY seconds between requests. HTTP/2 needs the
+    # h2 package (pip install "httpx[http2]").
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(
+        os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "120"))
+    OPENAI_HTTP2 = os.environ.get("OPENAI_HTTP2", "false").lower() == "true"
+    # Model requests time out after OPENAI_REQUEST_TIMEOUT seconds. Timeouts,
+    # throttling and server errors are retried with exponential backoff and
+    # jitter, for at most OPENAI_MAX_ATTEMPTS attempts within
+    # OPENAI_RETRY_DEADLINE seconds in total.
+    OPENAI_REQUEST_TIMEOUT = float(os.environ.get("OPENAI_REQUEST_TIMEOUT", "10"))
+    OPENAI_MAX_ATTEMPTS = int(os.environ.get("OPENAI_MAX_ATTEMPTS", "3"))
+    OPENAI_RETRY_BASE_DELAY = float(os.environ.get("OPENAI_RETRY_BASE_DELAY", "0.5"))
+    OPENAI_RETRY_MAX_DELAY = float(os.environ.get("OPENAI_RETRY_MAX_DELAY", "20"))
+    OPENAI_RETRY_DEADLINE = float(os.environ.get("OPENAI_RETRY_DEADLINE", "90"))
+    # Send a duplicate of a step request once it runs longer than the given
+    # percentile of recent ones, but never sooner than OPENAI_HEDGE_MIN_DELAY
+    # seconds. The first response wins. OPENAI_HEDGE_BUDGET caps duplicates as a
+    # fraction of all requests. OPENAI_HEDGE_MODEL sends them to another
+    # deployment, which must share the resource so previous responses resolve.
+    OPENAI_HEDGE = os.environ.get("OPENAI_HEDGE", "false").lower() == "true"
+    OPENAI_HEDGE_PERCENTILE = float(os.environ.get("OPENAI_HEDGE_PERCENTILE", "95"))
+    OPENAI_HEDGE_BUDGET = float(os.environ.get("OPENAI_HEDGE_BUDGET", "0.1"))
+    OPENAI_HEDGE_MIN_DELAY = float(os.environ.get("OPENAI_HEDGE_MIN_DELAY", "2.0"))
+    OPENAI_HEDGE_MODEL = os.environ.get("OPENAI_HEDGE_MODEL", None)
+
+    # Sessions that have not run for this many seconds end, and give their
+    # browser or desktop back.
+    SESSION_IDLE_SECONDS = int(os.environ.get("SESSION_IDLE_SECONDS", "1800"))
 
     # By default, we use VNC to control the computer.
     # But you may use a playwright browser instead.
     USE_BROWSER = os.environ.get("USE_BROWSER", "false").lower() == "true"
+    # Wait for the page to settle after each browser action: the network and DOM
+    # must stay quiet for the window, for at most the timeout, in seconds.
+    BROWSER_WAIT_FOR_STABLE = (
+        os.environ.get("BROWSER_WAIT_FOR_STABLE", "false").lower() == "true"
+    )
+    BROWSER_STABLE_WINDOW = float(os.environ.get("BROWSER_STABLE_WINDOW", "0.3"))
+    BROWSER_STABLE_TIMEOUT = float(os.environ.get("BROWSER_STABLE_TIMEOUT", "5.0"))
+    # Number of browsers launched ahead of time, so new sessions start instantly.
+    # 0 launches a browser when a session needs one.
+    BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "0"))
+    # The page new browsers open, e.g. about:blank to skip loading a site.
+    BROWSER_START_PAGE = os.environ.get("BROWSER_START_PAGE", "https://bing.com")
+    # Host sessions as isolated contexts in a few shared browser processes instead
+    # of one browser process per session. A process hosts up to
+    # BROWSER_CONTEXTS_PER_PROCESS contexts at once, and is replaced after hosting
+    # BROWSER_RECYCLE_AFTER contexts in total.
+    BROWSER_SHARED_PROCESSES = (
+        os.environ.get("BROWSER_SHARED_PROCESSES", "false").lower() == "true"
+    )
+    BROWSER_CONTEXTS_PER_PROCESS = int(
+        os.environ.get("BROWSER_CONTEXTS_PER_PROCESS", "20")
+    )
+    BROWSER_RECYCLE_AFTER = int(os.environ.get("BROWSER_RECYCLE_AFTER", "100"))
+    # Which requests the browser lets through: "full" loads everything, "lean"
+    # blocks video, web fonts, ads and analytics, and "text-only" also replaces
+    # images with blank placeholders.
+    BROWSER_ROUTING_PROFILE = os.environ.get("BROWSER_ROUTING_PROFILE", "full").lower()
+    # Background tabs beyond BROWSER_MAX_TABS are closed. Background tabs idle for
+    # BROWSER_TAB_IDLE_SECONDS, or the least recently used ones while all tabs use
+    # more than BROWSER_TAB_MEMORY_CEILING_MB of JS heap, are closed or frozen
+    # according to BROWSER_TAB_POLICY ("close" or "freeze").
+    BROWSER_MAX_TABS = int(os.environ.get("BROWSER_MAX_TABS", "5"))
+    BROWSER_TAB_IDLE_SECONDS = float(os.environ.get("BROWSER_TAB_IDLE_SECONDS", "600"))
+    BROWSER_TAB_MEMORY_CEILING_MB = int(
+        os.environ.get("BROWSER_TAB_MEMORY_CEILING_MB", "0")
+    )
+    BROWSER_TAB_POLICY = os.environ.get("BROWSER_TAB_POLICY", "close").lower()
     VNC_ADDRESS = os.environ.get("VNC_ADDRESS", "localhost::5900")
     VNC_PASSWORD = os.environ.get("VNC_PASSWORD", "secret")
+    # How long a VNC call waits for the server before the connection is dropped
+    VNC_CALL_TIMEOUT = float(os.environ.get("VNC_CALL_TIMEOUT", "60"))
+    # Comma separated VNC addresses of the desktops sessions are allocated from,
+    # falls back to VNC_ADDRESS. Sessions wait up to VNC_ACQUIRE_TIMEOUT seconds
+    # for a desktop when all are busy. Sessions keep their desktop between runs,
+    # but a queued session takes it over once the task is done, or once it sat
+    # idle for VNC_LEASE_IDLE_SECONDS (at most half the acquire timeout).
+    VNC_ADDRESSES = [
+        address.strip()
+        for address in os.environ.get("VNC_ADDRESSES", VNC_ADDRESS).split(",")
+        if address.strip()
+    ]
+    VNC_LEASE_IDLE_SECONDS = float(os.environ.get("VNC_LEASE_IDLE_SECONDS", "900"))
+    VNC_ACQUIRE_TIMEOUT = float(os.environ.get("VNC_ACQUIRE_TIMEOUT", "300"))
+    # Run before a desktop another session used is leased again, to restore it to
+    # a clean state, e.g. from a VM snapshot. {address} is replaced with the
+    # desktop's VNC address. Desktops are handed over as they are when not set.
+    VNC_RESET_COMMAND = os.environ.get("VNC_RESET_COMMAND", None)
+    VNC_RESET_TIMEOUT = float(os.environ.get("VNC_RESET_TIMEOUT", "300"))
+    # Keep a local mirror of the VNC framebuffer using incremental updates,
+    # instead of requesting the full screen for every screenshot.
+    VNC_FRAMEBUFFER_MIRROR = (
+        os.environ.get("VNC_FRAMEBUFFER_MIRROR", "false").lower() == "true"
+    )
+    # Wait for the screen to stop changing after each action instead of using
+    # fixed delays. This turns on the framebuffer mirror, whose updates tell when
+    # the screen changes.
+    VNC_SETTLE = os.environ.get("VNC_SETTLE", "false").lower() == "true"
+    # How long the screen must stay unchanged, and the longest wait, in seconds
+    VNC_SETTLE_WINDOW = float(os.environ.get("VNC_SETTLE_WINDOW", "0.3"))
+    VNC_SETTLE_TIMEOUT = float(os.environ.get("VNC_SETTLE_TIMEOUT", "3.0"))
+
+    # How the agent types text: "keys" types one key at a time, "batched" sends
+    # keys over VNC in batches, and "paste" pastes text through the clipboard
+    # (VNC) or inserts it directly (browser), typing only newlines and tabs.
+    TEXT_ENTRY_MODE = os.environ.get("TEXT_ENTRY_MODE", "keys").lower()
+    VNC_KEY_BATCH_SIZE = int(os.environ.get("VNC_KEY_BATCH_SIZE", "16"))
+    VNC_KEY_BATCH_DELAY = float(os.environ.get("VNC_KEY_BATCH_DELAY", "0.02"))
+
+    # How the VNC mouse travels: "instant", "eased", or "human" for a curved,
+    # paced path. Every move is split into at most VNC_MOUSE_MAX_STEPS events.
+    VNC_MOUSE_MOTION = os.environ.get("VNC_MOUSE_MOTION", "eased").lower()
+    VNC_MOUSE_MAX_STEPS = int(os.environ.get("VNC_MOUSE_MAX_STEPS", "20"))
+    # Scroll with bursts of this many wheel clicks, stopping early once the screen
+    # no longer moves. 0 scrolls one click at a time with a pause after each.
+    VNC_SCROLL_BURST_SIZE = int(os.environ.get("VNC_SCROLL_BURST_SIZE", "0"))
+
+    # Optional directory to keep a copy of every screenshot the agent takes.
+    # Screenshots are only kept in memory when this is not set.
+    SCREENSHOT_ARCHIVE_DIR = os.environ.get("SCREENSHOT_ARCHIVE_DIR", None)
+
+    # How screenshots are scaled to the size the model sees.
+    # The filter is one of nearest, box, bilinear, hamming, bicubic or lanczos.
+    SCREENSHOT_RESAMPLE = os.environ.get("SCREENSHOT_RESAMPLE", "lanczos")
+    SCREENSHOT_PNG_COMPRESS_LEVEL = int(
+        os.environ.get("SCREENSHOT_PNG_COMPRESS_LEVEL", "1")
+    )
+
+    # How much detail of each screenshot is sent to the model: "full", "low", or
+    # "adaptive" to send a smaller image after navigating or scrolling.
+    MODEL_IMAGE_POLICY = os.environ.get("MODEL_IMAGE_POLICY", "full").lower()
+    # Low detail images are scaled down by this factor and encoded in this format,
+    # "png" or "jpeg".
+    MODEL_IMAGE_LOW_DETAIL_SCALE = float(
+        os.environ.get("MODEL_IMAGE_LOW_DETAIL_SCALE", "0.5")
+    )
+    MODEL_IMAGE_LOW_DETAIL_FORMAT = os.environ.get(
+        "MODEL_IMAGE_LOW_DETAIL_FORMAT", "jpeg"
+    ).lower()
+    MODEL_IMAGE_JPEG_QUALITY = int(os.environ.get("MODEL_IMAGE_JPEG_QUALITY", "70"))
+
+    # Screenshots shown in Teams cards are small previews, the model still
+    # receives the full screenshot.
+    THUMBNAIL_MAX_WIDTH = int(os.environ.get("THUMBNAIL_MAX_WIDTH", "640"))
+    THUMBNAIL_MAX_BYTES = int(os.environ.get("THUMBNAIL_MAX_BYTES", "80000"))
+    # The preview format, "jpeg" or "webp"
+    THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "jpeg").lower()
+    # Progress cards are updated in the background. An update taking longer than
+    # this many seconds is dropped, the next one brings the card up to date.
+    PROGRESS_UPDATE_TIMEOUT = float(os.environ.get("PROGRESS_UPDATE_TIMEOUT", "10"))
+    # Updates are coalesced: a card waits this long for a newer one, the same
+    # card is updated at most once per min interval, and throttled updates back
+    # off for up to the max backoff, all in seconds.
+    PROGRESS_DEBOUNCE = float(os.environ.get("PROGRESS_DEBOUNCE", "0.25"))
+    PROGRESS_MIN_INTERVAL = float(os.environ.get("PROGRESS_MIN_INTERVAL", "1.0"))
+    PROGRESS_MAX_BACKOFF = float(os.environ.get("PROGRESS_MAX_BACKOFF", "30"))
+    # How many of the most recent steps progress cards list, 0 lists them all.
+    PROGRESS_HISTORY_STEPS = int(os.environ.get("PROGRESS_HISTORY_STEPS", "0"))
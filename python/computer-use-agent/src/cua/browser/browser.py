@@ -1,13 +1,20 @@
 import asyncio
 import json
 import logging
+import re
+import weakref
+from typing import Callable
 
 from openai.types.responses.function_tool_param import FunctionToolParam
 from openai.types.responses.response_computer_tool_call import Action
 from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
 from playwright.async_api import async_playwright
 
-from cua.cua_target import CUATarget, Screenshot
+from cua.browser.manager import LAUNCH_OPTIONS, BrowserManager
+from cua.browser.routing import RequestRouter, RoutingProfile, get_routing_profile
+from cua.browser.stability import PageStabilityWaiter
+from cua.browser.tabs import TabManager
+from cua.cua_target import CUATarget, Screenshot, ScreenshotArchiver
 
 logger = logging.getLogger(__name__)
 
@@ -65,49 +72,98 @@ class Browser(CUATarget):
     def environment(self) -> str:
         return "browser"
 
-    def __init__(self, width=1024, height=768):
+    def __init__(
+        self,
+        width=1024,
+        height=768,
+        archive_screenshot: ScreenshotArchiver | None = None,
+        insert_text: bool = False,
+        stability: PageStabilityWaiter | None = None,
+        start_page: str = "https://bing.com",
+        manager: BrowserManager | None = None,
+        routing_profile: RoutingProfile | None = None,
+        tab_manager_factory: Callable[[], TabManager] = TabManager,
+    ):
+        """
+        Args:
+            insert_text: Insert typed text in one go instead of key by key. Newlines
+                and tabs are still pressed as keys.
+            stability: If set, every action waits for the page to settle
+            start_page: The page a new browser opens, e.g. about:blank
+            manager: If set, the browser is a context in a shared browser process
+                instead of a browser process of its own
+            routing_profile: Which requests the browser blocks, all load by default
+            tab_manager_factory: Creates the tab manager of each new context
+        """
         super().__init__(width, height)
+        self.archive_screenshot = archive_screenshot
+        self.insert_text = insert_text
+        self.stability = stability
+        self.start_page = start_page
+        self.manager = manager
+        self.routing_profile = routing_profile or get_routing_profile("full")
+        self.router: RequestRouter | None = None
+        self.tab_manager_factory = tab_manager_factory
+        self.tabs: TabManager | None = None
+        self._pages_with_popup_handler = weakref.WeakSet()
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
 
     async def initialize(self):
-        if self.browser is not None and self.page is not None:
+        if self.context is not None and self.page is not None:
             # If we already have a fully initialized browser instance, just return
             return
 
-        if self.playwright is None:
-            self.playwright = await async_playwright().start()
+        if self.manager is not None:
+            if self.context is None:
+                self.context = await self.manager.new_context()
+        else:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
 
-        if self.browser is None:
-            self.browser = await self.playwright.chromium.launch(
-                headless=False,
-                chromium_sandbox=True,
-                env={},
-                args=["--disable-extensions", "--disable-file-system"],
-            )
+            if self.browser is None:
+                self.browser = await self.playwright.chromium.launch(**LAUNCH_OPTIONS)
+
+            if self.context is None:
+                self.context = await self.browser.new_context()
+
+        if self.router is None:
+            # A router per context, so the savings are counted per session
+            self.router = RequestRouter(self.routing_profile)
+            await self.router.attach(self.context)
 
-        if self.context is None:
-            self.context = await self.browser.new_context()
+        if self.tabs is None:
+            self.tabs = self.tab_manager_factory()
+            self.context.on("page", self.tabs.track)
 
         if self.page is None:
             self.page = await self.context.new_page()
             await self.page.set_viewport_size(
                 {"width": self.width, "height": self.height}
             )
+            if self.stability is not None:
+                self.stability.track(self.page)
+            await self.tabs.activate(self.page)
             await self.page.goto(
-                "https://bing.com", wait_until="domcontentloaded", timeout=60000
+                self.start_page, wait_until="domcontentloaded", timeout=60000
             )
             await self._setup_popup_handler()
 
     async def _setup_popup_handler(self):
         """Set up event listener for popups."""
+        if self.page in self._pages_with_popup_handler:
+            return
+        self._pages_with_popup_handler.add(self.page)
 
         async def handle_popup(popup):
             logger.info("New popup detected, switching to it")
+            if self.stability is not None:
+                self.stability.track(popup)
             await popup.wait_for_load_state("domcontentloaded")
             self.page = popup
+            await self.tabs.activate(popup)
             logger.info(f"Switched to popup with title: {await popup.title()}")
             await self._setup_popup_handler()
 
@@ -119,8 +175,40 @@ class Browser(CUATarget):
         if enabled and self.page:
             await self._setup_popup_handler()
 
+    async def is_healthy(self) -> bool:
+        """Whether the browser is running and its page responds."""
+        if self.context is None or self.page is None:
+            return False
+        if not self.context.browser.is_connected() or self.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.page.evaluate("1"), timeout=2)
+        except Exception:
+            return False
+        return True
+
+    async def reset(self):
+        """Replace the context with a fresh one showing the start page."""
+        await self._close_context()
+        await self.initialize()
+
+    async def _close_context(self):
+        # Closing the context also closes its pages, cookies and storage
+        context, self.context, self.page = self.context, None, None
+        router, self.router = self.router, None
+        self.tabs = None
+        if router is not None and router.profile.intercepts:
+            logger.info(f"Browser session closed, {router.summary()}")
+        if context is None:
+            return
+        if self.manager is not None:
+            await self.manager.release_context(context)
+        else:
+            await context.close()
+
     async def cleanup(self):
         """Clean up browser resources."""
+        await self._close_context()
         if self.browser:
             await self.browser.close()
             self.browser = None
@@ -131,13 +219,19 @@ class Browser(CUATarget):
         self.page = None
 
     async def take_screenshot(self) -> Screenshot:
-        return await self._screenshot_and_save("screenshot.png")
+        screenshot = Screenshot(
+            await self.page.screenshot(), width=self.width, height=self.height
+        )
+        self._archive(screenshot)
+        return screenshot
 
-    async def _screenshot_and_save(self, screenshot_name: str) -> Screenshot:
-        screenshot = await self.page.screenshot()
-        with open(screenshot_name, "wb") as f:
-            f.write(screenshot)
-        return Screenshot(screenshot)
+    async def _insert_text(self, text: str) -> None:
+        # Inserting fires a single input event, which is all most inputs listen to
+        for index, part in enumerate(re.split(r"(\n|\t)", text)):
+            if index % 2:
+                await self.page.keyboard.press("Enter" if part == "\n" else "Tab")
+            elif part:
+                await self.page.keyboard.insert_text(part)
 
     async def _take_action(self, action: Action) -> Screenshot | None:
         if action.type == "click":
@@ -162,36 +256,85 @@ class Browser(CUATarget):
             await self.page.mouse.move(action.x, action.y)
             await self.page.mouse.wheel(action.scroll_x, action.scroll_y)
         elif action.type == "type":
-            await self.page.keyboard.type(action.text)
+            if self.insert_text:
+                await self._insert_text(action.text)
+            else:
+                await self.page.keyboard.type(action.text)
         elif action.type == "wait":
-            await asyncio.sleep(1)  # Keep this async for the wait action
+            if self.stability is None:
+                await asyncio.sleep(1)  # Keep this async for the wait action
         elif action.type == "screenshot":
             return await self.take_screenshot()
         else:
             raise ValueError(f"Invalid action: {action.type}")
+        await self._wait_for_stable()
+
+    async def _wait_for_stable(self) -> None:
+        if self.stability is not None:
+            await self.stability.wait_for_stable(self.page)
 
     async def handle_tool_call(
         self, action: Action | ResponseFunctionToolCall
     ) -> Screenshot | str | None:
         logger.info("Taking action: %s", action)
+        await self._ensure_active_page()
         if isinstance(action, ResponseFunctionToolCall):
-            args = json.loads(action.arguments)
-            if action.name == "navigate":
-                await self.navigate(args["url"])
-                return "Done!"
-            elif action.name == "go_back":
-                await self.go_back()
-                return "Done!"
-            raise ValueError("Browser does not support additional action types")
-        return await self._take_action(action)
+            result = await self._handle_function_call(action)
+        else:
+            result = await self._take_action(action)
+        await self._ensure_active_page()
+        await self.tabs.enforce(self.page)
+        return result
+
+    async def _handle_function_call(self, action: ResponseFunctionToolCall) -> str:
+        args = json.loads(action.arguments)
+        if action.name == "navigate":
+            await self.navigate(args["url"])
+            return "Done!"
+        elif action.name == "go_back":
+            await self.go_back()
+            return "Done!"
+        elif action.name == "list_tabs":
+            return json.dumps(await self.tabs.describe(self.page))
+        elif action.name == "switch_tab":
+            return await self.switch_tab(args["index"])
+        raise ValueError("Browser does not support additional action types")
+
+    async def _ensure_active_page(self):
+        """Fall back to the most recent tab if the active one was closed."""
+        if self.page is not None and not self.page.is_closed():
+            return
+        page = self.tabs.most_recent()
+        if page is None:
+            page = await self.context.new_page()
+            await page.set_viewport_size({"width": self.width, "height": self.height})
+        logger.info("Active tab was closed, switching to %s", page.url)
+        self.page = page
+        await self.tabs.activate(page)
+        await self._setup_popup_handler()
+
+    async def switch_tab(self, index: int) -> str:
+        """Make the tab at the given index of the tab list the active one."""
+        pages = self.tabs.pages
+        if not 0 <= index < len(pages):
+            return f"There is no tab {index}, there are {len(pages)} tabs."
+        page = pages[index]
+        if page is not self.page:
+            self.page = page
+            await page.bring_to_front()
+            await self.tabs.activate(page)
+            await self._setup_popup_handler()
+        return f"Switched to tab {index}: {page.url}"
 
     async def navigate(self, url: str):
         """Navigate to a specific URL."""
         await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await self._wait_for_stable()
 
     async def go_back(self):
         """Go back to the previous page."""
         await self.page.go_back()
+        await self._wait_for_stable()
 
     @property
     def additional_tool_schemas(self) -> list[FunctionToolParam]:
@@ -216,4 +359,24 @@ class Browser(CUATarget):
                 description="Go back to the previous page.",
                 parameters={},
             ),
+            FunctionToolParam(
+                name="list_tabs",
+                type="function",
+                description="List the open tabs with their index, title and URL.",
+                parameters={},
+            ),
+            FunctionToolParam(
+                name="switch_tab",
+                type="function",
+                description="Switch to the open tab with the given index.",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "index": {
+                            "type": "integer",
+                            "description": "The index of the tab, from list_tabs.",
+                        },
+                    },
+                },
+            ),
         ]
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from playwright.async_api import Browser as PlaywrightBrowser
+from playwright.async_api import BrowserContext, Playwright, async_playwright
+from playwright.async_api import Error as PlaywrightError
+
+logger = logging.getLogger(__name__)
+
+# How Chromium is launched, whether it hosts one session or many
+LAUNCH_OPTIONS: dict[str, Any] = {
+    "headless": False,
+    "chromium_sandbox": True,
+    "env": {},
+    "args": ["--disable-extensions", "--disable-file-system"],
+}
+
+# Resolves to the JS heap used by a page, Chromium only
+_HEAP_USAGE_SCRIPT = (
+    "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+)
+
+
+@dataclass(eq=False)
+class _BrowserProcess:
+    browser: PlaywrightBrowser
+    contexts: set[BrowserContext] = field(default_factory=set)
+    # Contexts hosted over the process' lifetime, open or closed
+    hosted: int = 0
+    # Retired processes host no new contexts and close once their last one does
+    retired: bool = False
+
+
+class BrowserManager:
+    """
+    Hosts many isolated browser contexts in a few shared Chromium processes.
+
+    Every context has its own cookies, storage and cache, so sessions stay
+    isolated while sharing a process. New contexts go to the least loaded
+    process with room left. A process is recycled after hosting a given number of
+    contexts, which bounds the memory a long-running process accumulates.
+    """
+
+    def __init__(
+        self,
+        max_contexts_per_process: int = 20,
+        recycle_after: int = 100,
+        launch_options: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Args:
+            max_contexts_per_process: How many contexts a process hosts at once
+            recycle_after: How many contexts a process hosts in total before it is
+                replaced by a fresh one
+            launch_options: Options for launching Chromium
+        """
+        self.max_contexts_per_process = max_contexts_per_process
+        self.recycle_after = recycle_after
+        self.launch_options = launch_options or LAUNCH_OPTIONS
+        self._playwright: Playwright | None = None
+        self._processes: list[_BrowserProcess] = []
+        self._owners: dict[BrowserContext, _BrowserProcess] = {}
+        self._lock = asyncio.Lock()
+
+    async def new_context(self, **context_options: Any) -> BrowserContext:
+        """Create an isolated context in one of the shared processes."""
+        async with self._lock:
+            process = self._pick_process() or await self._launch()
+            process.hosted += 1
+            if process.hosted >= self.recycle_after:
+                logger.info("Browser process reached its context limit, recycling it")
+                process.retired = True
+            context = await process.browser.new_context(**context_options)
+            process.contexts.add(context)
+        self._owners[context] = process
+        return context
+
+    async def release_context(self, context: BrowserContext) -> None:
+        """Close a context, and its process if that was retired and is now idle."""
+        process = self._owners.pop(context, None)
+        if logger.isEnabledFor(logging.DEBUG):
+            heap_bytes = await self.context_memory(context)
+            logger.debug(f"Releasing a context using {heap_bytes} bytes of JS heap")
+        try:
+            await context.close()
+        except PlaywrightError as e:
+            logger.debug(f"Context was already closed: {e}")
+        if process is None:
+            return
+        process.contexts.discard(context)
+        if process.retired and not process.contexts:
+            await self._close_process(process)
+
+    async def context_memory(self, context: BrowserContext) -> int:
+        """The JS heap used by the pages of a context, in bytes."""
+        total = 0
+        for page in context.pages:
+            try:
+                total += await page.evaluate(_HEAP_USAGE_SCRIPT)
+            except PlaywrightError:
+                # The page closed or navigated mid-check
+                pass
+        return total
+
+    async def memory_usage(self) -> list[dict[str, int]]:
+        """Per process, the number of contexts and the JS heap they use, in bytes."""
+        usage = []
+        for process in self._processes:
+            heaps = await asyncio.gather(
+                *(self.context_memory(context) for context in process.contexts)
+            )
+            usage.append(
+                {
+                    "contexts": len(process.contexts),
+                    "hosted": process.hosted,
+                    "heap_bytes": sum(heaps),
+                }
+            )
+        return usage
+
+    async def close(self) -> None:
+        """Close every process and stop Playwright."""
+        async with self._lock:
+            await asyncio.gather(
+                *(self._close_process(process) for process in list(self._processes))
+            )
+            self._owners.clear()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def _pick_process(self) -> _BrowserProcess | None:
+        candidates = [
+            process
+            for process in self._processes
+            if not process.retired
+            and process.browser.is_connected()
+            and len(process.contexts) < self.max_contexts_per_process
+        ]
+        return min(candidates, key=lambda p: len(p.contexts), default=None)
+
+    async def _launch(self) -> _BrowserProcess:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        logger.info(f"Launching shared browser process #{len(self._processes) + 1}")
+        browser = await self._playwright.chromium.launch(**self.launch_options)
+        process = _BrowserProcess(browser)
+        # A crashed process takes its contexts with it, stop placing new ones there
+        browser.on("disconnected", lambda _: self._forget_process(process))
+        self._processes.append(process)
+        return process
+
+    def _forget_process(self, process: _BrowserProcess) -> None:
+        if process in self._processes:
+            self._processes.remove(process)
+        for context in process.contexts:
+            self._owners.pop(context, None)
+        process.contexts.clear()
+
+    async def _close_process(self, process: _BrowserProcess) -> None:
+        self._forget_process(process)
+        try:
+            await process.browser.close()
+        except PlaywrightError as e:
+            logger.debug(f"Browser process was already closed: {e}")
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Callable
+
+from cua.browser.browser import Browser
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """
+    A process-wide pool of pre-launched browsers.
+
+    Sessions check out a browser that is already running and showing the start
+    page, instead of waiting for Playwright and Chromium to start. Returned
+    browsers get a fresh context, so nothing of a session carries over to the
+    next one, and go back into the pool. The pool is refilled in the background,
+    one browser at a time, to avoid CPU spikes when many sessions start at once.
+    """
+
+    def __init__(self, factory: Callable[[], Browser], size: int = 0):
+        """
+        Args:
+            factory: Creates an uninitialized browser
+            size: How many idle browsers to keep ready, 0 disables pre-warming
+        """
+        self.factory = factory
+        self.size = size
+        self._idle: list[Browser] = []
+        self._in_use: set[Browser] = set()
+        self._refill_task: asyncio.Task | None = None
+        self._closed = False
+
+    async def start(self) -> None:
+        """Start pre-warming browsers in the background."""
+        self._closed = False
+        self._schedule_refill()
+
+    async def acquire(self) -> Browser:
+        """Check out a healthy browser, launching one if none is ready."""
+        browser = None
+        while self._idle:
+            candidate = self._idle.pop()
+            if await candidate.is_healthy():
+                browser = candidate
+                break
+            logger.warning("Discarding an unhealthy pooled browser")
+            await candidate.cleanup()
+
+        if browser is None:
+            logger.info("No pre-warmed browser available, launching one")
+            browser = self.factory()
+            await browser.initialize()
+
+        self._in_use.add(browser)
+        self._schedule_refill()
+        return browser
+
+    async def release(self, browser: Browser) -> None:
+        """Return a browser to the pool, or close it if the pool is full."""
+        self._in_use.discard(browser)
+        if self._closed or len(self._idle) >= self.size:
+            await browser.cleanup()
+            return
+
+        try:
+            await browser.reset()
+        except Exception as e:
+            logger.warning(f"Failed to reset browser, closing it: {e}")
+            await browser.cleanup()
+            self._schedule_refill()
+            return
+        self._idle.append(browser)
+
+    async def close(self) -> None:
+        """Close every browser, idle or in use."""
+        self._closed = True
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+        browsers = self._idle + list(self._in_use)
+        self._idle.clear()
+        self._in_use.clear()
+        await asyncio.gather(
+            *(browser.cleanup() for browser in browsers), return_exceptions=True
+        )
+
+    def _schedule_refill(self) -> None:
+        if self._closed or len(self._idle) >= self.size:
+            return
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        while not self._closed and len(self._idle) < self.size:
+            browser = self.factory()
+            try:
+                await browser.initialize()
+            except asyncio.CancelledError:
+                await browser.cleanup()
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm a browser: {e}")
+                await browser.cleanup()
+                return
+            if self._closed:
+                await browser.cleanup()
+                return
+            self._idle.append(browser)
+            logger.info(f"Pre-warmed browser pool has {len(self._idle)}/{self.size}")
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+import weakref
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import Page, Request
+
+logger = logging.getLogger(__name__)
+
+# Resolves to the milliseconds since the DOM last changed, once the page has
+# rendered two more frames. The observer is installed once per document.
+_DOM_QUIET_SCRIPT = """
+async () => {
+    if (!window.__cuaStability) {
+        const state = { lastMutation: performance.now() };
+        new MutationObserver(() => { state.lastMutation = performance.now(); })
+            .observe(document, {
+                subtree: true, childList: true, attributes: true, characterData: true,
+            });
+        window.__cuaStability = state;
+    }
+    // Frames are not rendered for hidden pages, so do not wait on them forever
+    await Promise.race([
+        new Promise((resolve) =>
+            requestAnimationFrame(() => requestAnimationFrame(resolve))),
+        new Promise((resolve) => setTimeout(resolve, 100)),
+    ]);
+    return performance.now() - window.__cuaStability.lastMutation;
+}
+"""
+
+
+class _NetworkActivity:
+    """Tracks the requests in flight on a page."""
+
+    def __init__(self) -> None:
+        self.in_flight: set[Request] = set()
+        self.last_activity = time.monotonic()
+
+    def on_request(self, request: Request) -> None:
+        self.in_flight.add(request)
+        self.last_activity = time.monotonic()
+
+    def on_request_done(self, request: Request) -> None:
+        self.in_flight.discard(request)
+        self.last_activity = time.monotonic()
+
+
+class PageStabilityWaiter:
+    """
+    Waits for a page to settle after an action.
+
+    A page counts as settled when, for the whole quiet window, at most a few
+    requests have been in flight, which allows for long polling, and the DOM has
+    not changed, checked after letting the page render animation frames. The wait
+    gives up at the timeout, so a page that never settles is captured as it is.
+    """
+
+    def __init__(
+        self,
+        quiet_window: float = 0.3,
+        timeout: float = 5.0,
+        max_in_flight: int = 2,
+        poll_interval: float = 0.05,
+    ) -> None:
+        """
+        Args:
+            quiet_window: How long the network and DOM must stay quiet, in seconds
+            timeout: The upper bound of a wait, in seconds
+            max_in_flight: How many requests may still be in flight on a quiet page
+            poll_interval: Pause between checks, in seconds
+        """
+        self.quiet_window = quiet_window
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self._network: weakref.WeakKeyDictionary[Page, _NetworkActivity] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def track(self, page: Page) -> None:
+        """Start tracking the network activity of a page. Does nothing if tracked."""
+        if page in self._network:
+            return
+        activity = _NetworkActivity()
+        page.on("request", activity.on_request)
+        page.on("requestfinished", activity.on_request_done)
+        page.on("requestfailed", activity.on_request_done)
+        self._network[page] = activity
+
+    async def wait_for_stable(self, page: Page) -> bool:
+        """
+        Wait until the page is stable.
+
+        Returns:
+            Whether the page settled before the timeout
+        """
+        self.track(page)
+        activity = self._network[page]
+        start = time.monotonic()
+        while True:
+            remaining = self.timeout - (time.monotonic() - start)
+            dom_quiet = await self._dom_quiet(page, remaining)
+            if dom_quiet and self._network_quiet(activity):
+                logger.debug("Page settled after %.2fs", time.monotonic() - start)
+                return True
+            if time.monotonic() - start >= self.timeout:
+                logger.debug("Page still busy after %.2fs, giving up", self.timeout)
+                return False
+            await asyncio.sleep(self.poll_interval)
+
+    def _network_quiet(self, activity: _NetworkActivity) -> bool:
+        return (
+            len(activity.in_flight) <= self.max_in_flight
+            and time.monotonic() - activity.last_activity >= self.quiet_window
+        )
+
+    async def _dom_quiet(self, page: Page, timeout: float) -> bool:
+        try:
+            quiet_ms = await asyncio.wait_for(
+                page.evaluate(_DOM_QUIET_SCRIPT), timeout=max(timeout, 0)
+            )
+        except PlaywrightError:
+            # The document was replaced mid-check, e.g. by a navigation
+            return False
+        except asyncio.TimeoutError:
+            # The page's main thread is busy, it is anything but quiet
+            return False
+        return quiet_ms >= self.quiet_window * 1000
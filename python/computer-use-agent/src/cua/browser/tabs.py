@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from playwright.async_api import CDPSession, Page
+from playwright.async_api import Error as PlaywrightError
+
+logger = logging.getLogger(__name__)
+
+# Resolves to the JS heap used by a page, Chromium only
+_HEAP_USAGE_SCRIPT = (
+    "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+)
+
+
+@dataclass(eq=False)
+class Tab:
+    page: Page
+    last_active: float
+    frozen: bool = False
+    cdp_session: CDPSession | None = None
+
+
+class TabManager:
+    """
+    Tracks the pages of a browser context and retires background tabs.
+
+    Only background tabs are ever retired, the active one is left alone. The
+    number of open tabs is a hard cap, the oldest background tabs beyond it are
+    closed. Tabs idle for too long, and the least recently used ones while the
+    context is over its memory ceiling, are closed or frozen depending on the
+    policy. Frozen tabs keep their state but stop running and are resumed when
+    they become active again.
+    """
+
+    POLICIES = ("close", "freeze")
+
+    def __init__(
+        self,
+        max_tabs: int = 5,
+        idle_timeout: float | None = 600.0,
+        memory_ceiling_bytes: int | None = None,
+        policy: str = "close",
+    ) -> None:
+        """
+        Args:
+            max_tabs: The most tabs open at once
+            idle_timeout: Seconds after which a background tab is retired
+            memory_ceiling_bytes: The JS heap all tabs may use together
+            policy: "close" or "freeze" idle and memory hungry background tabs
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f"Unknown tab policy {policy!r}, expected one of {self.POLICIES}"
+            )
+        self.max_tabs = max(max_tabs, 1)
+        self.idle_timeout = idle_timeout
+        self.memory_ceiling_bytes = memory_ceiling_bytes
+        self.policy = policy
+        self._tabs: list[Tab] = []
+
+    @property
+    def pages(self) -> list[Page]:
+        """The open pages, oldest first."""
+        return [tab.page for tab in self._tabs]
+
+    def track(self, page: Page) -> None:
+        """Start tracking a page. Does nothing if it is already tracked."""
+        if self._find(page) is not None:
+            return
+        self._tabs.append(Tab(page, last_active=time.monotonic()))
+        page.on("close", lambda _: self._forget(page))
+
+    async def activate(self, page: Page) -> None:
+        """Mark a page as the active tab, resuming it if it was frozen."""
+        self.track(page)
+        tab = self._find(page)
+        tab.last_active = time.monotonic()
+        if tab.frozen:
+            await self._set_lifecycle_state(tab, "active")
+            tab.frozen = False
+
+    def most_recent(self) -> Page | None:
+        """The most recently active open page."""
+        tab = max(self._tabs, key=lambda tab: tab.last_active, default=None)
+        return tab.page if tab else None
+
+    async def describe(self, active_page: Page | None) -> list[dict]:
+        """Summaries of the open tabs, for the model to choose from."""
+        tabs = []
+        for index, tab in enumerate(self._tabs):
+            try:
+                title = await tab.page.title()
+            except PlaywrightError:
+                title = ""
+            tabs.append(
+                {
+                    "index": index,
+                    "title": title,
+                    "url": tab.page.url,
+                    "active": tab.page is active_page,
+                    "frozen": tab.frozen,
+                }
+            )
+        return tabs
+
+    async def enforce(self, active_page: Page | None) -> None:
+        """Apply the policy to every background tab."""
+        now = time.monotonic()
+        background = sorted(
+            (tab for tab in self._tabs if tab.page is not active_page),
+            key=lambda tab: tab.last_active,
+        )
+
+        # Over the cap, the least recently used tabs are closed regardless of policy
+        while background and len(self._tabs) > self.max_tabs:
+            await self._close(background.pop(0), "too many tabs")
+
+        if self.idle_timeout is not None:
+            for tab in list(background):
+                if now - tab.last_active >= self.idle_timeout:
+                    background.remove(tab)
+                    await self._retire(tab, "idle")
+
+        if self.memory_ceiling_bytes:
+            await self._enforce_memory_ceiling(background)
+
+    async def _enforce_memory_ceiling(self, background: list[Tab]) -> None:
+        running = [tab for tab in self._tabs if not tab.frozen]
+        heaps = await asyncio.gather(*(self._heap_usage(tab) for tab in running))
+        usage = dict(zip(running, heaps))
+        total = sum(heaps)
+        for tab in background:
+            if total <= self.memory_ceiling_bytes:
+                break
+            if tab in usage:
+                total -= usage[tab]
+                await self._retire(tab, "memory ceiling")
+
+    async def _retire(self, tab: Tab, reason: str) -> None:
+        if self.policy == "freeze":
+            if not tab.frozen:
+                logger.info(f"Freezing tab {tab.page.url} ({reason})")
+                await self._set_lifecycle_state(tab, "frozen")
+                tab.frozen = True
+        else:
+            await self._close(tab, reason)
+
+    async def _close(self, tab: Tab, reason: str) -> None:
+        logger.info(f"Closing tab {tab.page.url} ({reason})")
+        self._forget(tab.page)
+        try:
+            await tab.page.close()
+        except PlaywrightError as e:
+            logger.debug(f"Tab was already closed: {e}")
+
+    async def _set_lifecycle_state(self, tab: Tab, state: str) -> None:
+        try:
+            if tab.cdp_session is None:
+                tab.cdp_session = await tab.page.context.new_cdp_session(tab.page)
+            await tab.cdp_session.send("Page.setWebLifecycleState", {"state": state})
+        except PlaywrightError as e:
+            logger.warning(f"Failed to set tab lifecycle state to {state}: {e}")
+
+    @staticmethod
+    async def _heap_usage(tab: Tab) -> int:
+        try:
+            return await tab.page.evaluate(_HEAP_USAGE_SCRIPT)
+        except PlaywrightError:
+            return 0
+
+    def _find(self, page: Page) -> Tab | None:
+        return next((tab for tab in self._tabs if tab.page is page), None)
+
+    def _forget(self, page: Page) -> None:
+        self._tabs = [tab for tab in self._tabs if tab.page is not page]
@@ -1,15 +1,47 @@
+import importlib.util
 import logging
 
-from openai import AsyncAzureOpenAI, AsyncOpenAI
+import httpx
+from openai import AsyncAzureOpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
 
 from config import Config
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+# The process-wide client and model, shared by every run so that connections to
+# the endpoint are kept alive between steps instead of set up for every run
+_client: AsyncOpenAI | None = None
+_model: str | None = None
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    http2 = Config.OPENAI_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("OPENAI_HTTP2 is set but h2 is not installed, using HTTP/1.1")
+        http2 = False
+
+    return DefaultAsyncHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
+
 
 def setup_openai_client():
-    """Set up and return the appropriate OpenAI client based on configuration."""
+    """
+    Return the shared OpenAI client and the model to use with it.
+
+    The client is created on first use, based on configuration.
+    """
+    global _client, _model
+    if _client is not None:
+        return _client, _model
+
+    http_client = _build_http_client()
     if Config.AZURE_OPENAI_API_KEY:
         logger.info("Using Azure OpenAI")
         client = AsyncAzureOpenAI(
@@ -17,15 +49,24 @@ def setup_openai_client():
             azure_deployment=Config.AZURE_OPENAI_DEPLOYMENT,
             api_version=Config.AZURE_OPENAI_API_VERSION,
             api_key=Config.AZURE_OPENAI_API_KEY,
+            http_client=http_client,
         )
         model = Config.AZURE_OPENAI_DEPLOYMENT
     else:
-        logger.info(
-            "Using OpenAI for computer use using key: %s", Config.OPENAI_API_KEY
-        )
+        logger.info("Using OpenAI for computer use")
         client = AsyncOpenAI(
             api_key=Config.OPENAI_API_KEY,
+            http_client=http_client,
         )
         model = "computer-use-preview"
 
+    _client, _model = client, model
     return client, model
+
+
+async def close_openai_client() -> None:
+    """Close the shared client and its connections, if it was created."""
+    global _client, _model
+    client, _client, _model = _client, None, None
+    if client is not None:
+        await client.close()
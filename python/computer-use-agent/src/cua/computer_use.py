@@ -1,26 +1,69 @@
-import base64
 import logging
 
 from openai.types.responses.response import Response
+from openai.types.responses.response_computer_tool_call import Action
+from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
 from openai.types.responses.tool_param import ToolParam
 
+from config import Config
 from cua.client import setup_openai_client
-from cua.cua_target import CUATarget
-from cua.utils import retry_async_operation
+from cua.cua_target import CUATarget, Screenshot, ScrollResult
+from cua.hedging import RequestHedger
+from cua.input_policy import ModelImagePolicy
+from cua.utils import RetryPolicy, retry_async_operation, run_in_image_pool
 from storage.cua_session import CuaSession
+from thumbnails import Thumbnail, create_thumbnail, get_thumbnail_format
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+# Checked at startup, so that a typo fails before the first step
+THUMBNAIL_FORMAT = get_thumbnail_format(Config.THUMBNAIL_FORMAT)
+
+# Shared by every run, so its metrics cover the whole process
+RESPONSES_RETRY_POLICY = RetryPolicy(
+    max_retries=Config.OPENAI_MAX_ATTEMPTS,
+    base_delay=Config.OPENAI_RETRY_BASE_DELAY,
+    max_delay=Config.OPENAI_RETRY_MAX_DELAY,
+    deadline=Config.OPENAI_RETRY_DEADLINE,
+)
+
+# Opt-in, duplicates step requests that run later than most recent ones
+RESPONSES_HEDGER = (
+    RequestHedger(
+        percentile=Config.OPENAI_HEDGE_PERCENTILE,
+        budget_ratio=Config.OPENAI_HEDGE_BUDGET,
+        min_delay=Config.OPENAI_HEDGE_MIN_DELAY,
+    )
+    if Config.OPENAI_HEDGE
+    else None
+)
+
 
 class ComputerUse:
     """ComputerUse loop to start and continue task execution"""
 
-    def __init__(self, target: CUATarget, session: CuaSession):
+    def __init__(
+        self,
+        target: CUATarget,
+        session: CuaSession,
+        image_policy: ModelImagePolicy | None = None,
+    ):
         self.target = target
         self.session = session
-        self.client, self.model = setup_openai_client()
+        self.image_policy = image_policy or ModelImagePolicy()
+        # Actions performed since the model last received a screenshot
+        self._actions_since_screenshot: list[Action | ResponseFunctionToolCall] = []
+        client, self.model = setup_openai_client()
+        # Retries are up to the retry policy, the SDK's own would multiply them
+        self.client = client.with_options(
+            max_retries=0, timeout=Config.OPENAI_REQUEST_TIMEOUT
+        )
         self.step_count = 0
+        # False when the last step's screenshot matched the one before it
+        self.screen_changed = True
+        self._last_screenshot: Screenshot | None = None
+        self._last_thumbnail: Thumbnail | None = None
 
     def _build_computer_use_tool(self) -> list[ToolParam]:
         default_tools = [
@@ -37,8 +80,11 @@ class ComputerUse:
     async def start_task(self, user_message: str):
         logger.info("Starting task...")
         tools = self._build_computer_use_tool()
-        response = await self.client.responses.create(
-            model=self.model, input=user_message, tools=tools, truncation="auto"
+        response = await retry_async_operation(
+            operation=lambda: self.client.responses.create(
+                model=self.model, input=user_message, tools=tools, truncation="auto"
+            ),
+            policy=RESPONSES_RETRY_POLICY,
         )
         logger.debug("Response received: %s", response)
         self.session.add_step(response, None)
@@ -51,22 +97,69 @@ class ComputerUse:
     def requires_safety_check(self):
         return self.session.current_step.pending_safety_checks
 
+    def _dedupe_screenshot(self, screenshot: Screenshot) -> Screenshot:
+        """
+        Return the previous screenshot instead if the screen is unchanged, so its
+        memoized encodings and thumbnail are reused.
+
+        Captures are encoded deterministically, so identical screens produce identical
+        bytes and an exact digest is enough to detect them. A perceptual hash would be
+        cheaper to fool: a single typed character must never be mistaken for no change.
+        """
+        last_screenshot = self._last_screenshot
+        if last_screenshot is not None and screenshot.digest == last_screenshot.digest:
+            logger.debug("Screen unchanged, reusing the previous screenshot")
+            self.screen_changed = False
+            return last_screenshot
+
+        self._last_screenshot = screenshot
+        self._last_thumbnail = None
+        return screenshot
+
+    async def _get_thumbnail(self, screenshot: Screenshot) -> Thumbnail:
+        """Create the card preview of the last screenshot, once per screen."""
+        if self._last_thumbnail is None:
+            self._last_thumbnail = await run_in_image_pool(
+                create_thumbnail,
+                screenshot.data,
+                max_width=Config.THUMBNAIL_MAX_WIDTH,
+                max_bytes=Config.THUMBNAIL_MAX_BYTES,
+                image_format=THUMBNAIL_FORMAT,
+            )
+        return self._last_thumbnail
+
     async def continue_task(self, user_message=""):
         self.step_count += 1
         logger.debug("\n---- Step %s ----", self.step_count)
-        screenshot: str | None = None
+        screenshot: Screenshot | None = None
         previous_response_id = self.session.current_step.response_id
-        screenshot_base64: str | None = None
+        thumbnail: Thumbnail | None = None
+        self.screen_changed = True
 
         if self.session.current_step.next_action == "computer_call_output":
             action = self.session.current_step.call_action
             screenshot = await self.target.handle_tool_call(action)
+            if isinstance(screenshot, ScrollResult):
+                self.session.current_step.scrolled = screenshot
+                logger.info(
+                    "Scrolled by %s of the requested %s",
+                    screenshot.scrolled,
+                    screenshot.requested,
+                )
+                screenshot = None
             if not screenshot:
                 screenshot = await self.target.take_screenshot()
-            screenshot_base64 = base64.b64encode(screenshot).decode("utf-8")
-            logger.debug("screenshot %s...", screenshot_base64[:20])
+            screenshot = self._dedupe_screenshot(screenshot)
+            thumbnail = await self._get_thumbnail(screenshot)
+            self._actions_since_screenshot.append(action)
+            model_screenshot = await self.target.encode_for_model(
+                screenshot,
+                self.image_policy.settings_for(self._actions_since_screenshot),
+            )
+            self._actions_since_screenshot.clear()
+            logger.debug("screenshot %s, sent as %s", screenshot, model_screenshot)
             # Store the screenshot in the session
-            self.session.current_step.screenshot = screenshot_base64
+            self.session.current_step.screenshot = screenshot
         if self.session.current_step.next_action == "reasoning":
             # For reasoning, we send back the reasoning content
             data = self.session.current_step.call_action
@@ -79,7 +172,7 @@ class ComputerUse:
                     "call_id": self.session.current_step.call_id,
                     "output": {
                         "type": "input_image",
-                        "image_url": f"data:image/png;base64,{screenshot_base64}",
+                        "image_url": model_screenshot.data_url,
                     },
                 }
             ]
@@ -91,6 +184,7 @@ class ComputerUse:
             # Handle functional call output
             action = self.session.current_step.call_action
             result = await self.target.handle_tool_call(action)
+            self._actions_since_screenshot.append(action)
             data = [
                 {
                     "type": "function_call_output",
@@ -103,25 +197,34 @@ class ComputerUse:
         logger.debug("Creating next response...")
 
         # Define the operation to retry
-        async def create_response():
+        async def create_response(model: str = self.model):
             return await self.client.responses.create(
-                model=self.model,
+                model=model,
                 previous_response_id=previous_response_id,
                 input=data,
                 tools=tools,
-                timeout=10,
                 truncation="auto",
                 parallel_tool_calls=False,
             )
 
+        async def create_hedged_response():
+            return await RESPONSES_HEDGER.run(
+                create_response,
+                hedge=lambda: create_response(Config.OPENAI_HEDGE_MODEL or self.model),
+            )
+
         # Define the check function
         def validate_response(response: Response):
             return bool(response.output)
 
         # Use the retry function
         next_response = await retry_async_operation(
-            operation=create_response, max_retries=3, check_result=validate_response
+            operation=(
+                create_hedged_response if RESPONSES_HEDGER else create_response
+            ),
+            check_result=validate_response,
+            policy=RESPONSES_RETRY_POLICY,
         )
 
         logger.info("Next response created: %s", next_response)
-        self.session.add_step(next_response, screenshot_base64)
+        self.session.add_step(next_response, screenshot, thumbnail)
@@ -1,38 +1,150 @@
 import asyncio
+import functools
 import logging
+import shlex
 import signal
 import traceback
+from datetime import datetime
 
 from botbuilder.core import TurnContext
 from botbuilder.schema import Activity, ActivityTypes, Attachment, AttachmentLayoutTypes
-from openai.types.responses.response_function_tool_call import (
-    ResponseFunctionToolCall,
-)
 
 from cards import (
-    ProgressStepDict,
     create_cua_progress_card,
     create_error_card,
     create_safety_check_card,
 )
 from config import Config
 from cua.browser.browser import Browser
+from cua.browser.manager import BrowserManager
+from cua.browser.pool import BrowserPool
+from cua.browser.routing import get_routing_profile
+from cua.browser.stability import PageStabilityWaiter
+from cua.browser.tabs import TabManager
 from cua.computer_use import ComputerUse
 from cua.cua_target import CUATarget
-from cua.scaled_cua_target import ScaledCUATarget
+from cua.input_policy import ModelImagePolicy, ModelImageSettings
+from cua.scaled_cua_target import ScaledCUATarget, get_resample_filter
+from cua.utils import archive_screenshots_to
 from cua.vnc.machine import Machine
+from cua.vnc.motion import MotionPlanner
+from cua.vnc.pool import DesktopPool
+from progress import ProgressPublisher
 from storage.cua_session import CuaSession
+from storage.screenshot_store import ScreenshotStore
 
 logger = logging.getLogger(__name__)
 
+# Default screen size
+WIDTH = 1024
+HEIGHT = 768
+# Checked at startup, so that a typo fails before the first task
+RESAMPLE = get_resample_filter(Config.SCREENSHOT_RESAMPLE)
+
+
+def _build_screenshot_archiver():
+    return (
+        archive_screenshots_to(Config.SCREENSHOT_ARCHIVE_DIR)
+        if Config.SCREENSHOT_ARCHIVE_DIR
+        else None
+    )
+
+
+def create_browser(manager: BrowserManager | None = None) -> Browser:
+    """
+    Create an uninitialized browser target as configured.
+
+    Args:
+        manager: Hosts the browser in a shared browser process, if set
+    """
+    return Browser(
+        width=WIDTH,
+        height=HEIGHT,
+        archive_screenshot=_build_screenshot_archiver(),
+        insert_text=Config.TEXT_ENTRY_MODE == "paste",
+        stability=(
+            PageStabilityWaiter(
+                quiet_window=Config.BROWSER_STABLE_WINDOW,
+                timeout=Config.BROWSER_STABLE_TIMEOUT,
+            )
+            if Config.BROWSER_WAIT_FOR_STABLE
+            else None
+        ),
+        start_page=Config.BROWSER_START_PAGE,
+        manager=manager,
+        routing_profile=get_routing_profile(Config.BROWSER_ROUTING_PROFILE),
+        tab_manager_factory=functools.partial(
+            TabManager,
+            max_tabs=Config.BROWSER_MAX_TABS,
+            idle_timeout=Config.BROWSER_TAB_IDLE_SECONDS,
+            memory_ceiling_bytes=Config.BROWSER_TAB_MEMORY_CEILING_MB * 1024 * 1024,
+            policy=Config.BROWSER_TAB_POLICY,
+        ),
+    )
+
+
+async def reset_desktop(address: str) -> None:
+    """Run VNC_RESET_COMMAND for a desktop, e.g. to restore it from a snapshot."""
+    command = shlex.split(Config.VNC_RESET_COMMAND.format(address=address))
+    process = await asyncio.create_subprocess_exec(*command)
+    try:
+        returncode = await asyncio.wait_for(
+            process.wait(), timeout=Config.VNC_RESET_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        process.kill()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"Reset command exited with status {returncode}")
+
+
+def create_machine(address: str) -> Machine:
+    """Create the target for the desktop at a VNC address, as configured."""
+    return Machine(
+        width=WIDTH,
+        height=HEIGHT,
+        address=address,
+        password=Config.VNC_PASSWORD,
+        archive_screenshot=_build_screenshot_archiver(),
+        use_framebuffer_mirror=Config.VNC_FRAMEBUFFER_MIRROR,
+        settle_window=Config.VNC_SETTLE_WINDOW if Config.VNC_SETTLE else None,
+        settle_timeout=Config.VNC_SETTLE_TIMEOUT,
+        text_entry=Config.TEXT_ENTRY_MODE,
+        key_batch_size=Config.VNC_KEY_BATCH_SIZE,
+        key_batch_delay=Config.VNC_KEY_BATCH_DELAY,
+        motion=MotionPlanner(
+            profile=Config.VNC_MOUSE_MOTION,
+            max_steps=Config.VNC_MOUSE_MAX_STEPS,
+        ),
+        scroll_burst_size=Config.VNC_SCROLL_BURST_SIZE,
+        vnc_timeout=Config.VNC_CALL_TIMEOUT,
+    )
+
 
 class ComputerUseAgent:
     def __init__(
-        self, context: TurnContext, session: CuaSession, activity_id: str | None
+        self,
+        context: TurnContext,
+        session: CuaSession,
+        activity_id: str | None,
+        screenshot_store: ScreenshotStore,
+        browser_pool: BrowserPool,
+        desktop_pool: DesktopPool,
+        progress_publisher: ProgressPublisher,
     ):
         self._context = context
         self._session = session
         self._activity_id = activity_id
+        self._screenshot_store = screenshot_store
+        self._browser_pool = browser_pool
+        self._desktop_pool = desktop_pool
+        # Progress cards go out in the background, alongside the next model call.
+        # A run without an activity id sends its card as a new message.
+        self._progress = progress_publisher
+        self._progress_key = activity_id or f"{session.id}:{id(self)}"
+        # Whether a progress card went out in this run, and the status it showed
+        self._progress_shown = False
+        self._progress_status: str | None = None
 
     async def run(self, task: str):
         def signal_handler():
@@ -42,12 +154,27 @@ class ComputerUseAgent:
         loop = asyncio.get_running_loop()
         loop.add_signal_handler(signal.SIGINT, signal_handler)
 
+        self._session.running = True
+        # Checked before a new desktop replaces the reclaimed one
+        desktop_reclaimed = self._session.desktop_reclaimed
         try:
             cua_target = await self._build_cua_target()
-            agent = ComputerUse(cua_target, self._session)
+            agent = ComputerUse(
+                cua_target, self._session, image_policy=self._build_image_policy()
+            )
 
             user_message = task
-            if self._session.current_step or self._session.status in (
+            if desktop_reclaimed:
+                # The new desktop was reset, and the model has never seen it, so
+                # continuing the previous responses would act on a stale screen
+                await self._context.send_activity(
+                    "The desktop went to another session in the meantime, "
+                    "starting the task over on a fresh one."
+                )
+                self._session.signal = None
+                self._session.task = user_message or self._session.task
+                await agent.start_task(self._session.task)
+            elif self._session.current_step or self._session.status in (
                 "Paused",
                 "Error",
             ):
@@ -64,6 +191,7 @@ class ComputerUseAgent:
                 else:
                     await agent.continue_task(user_message)
             else:
+                self._session.task = user_message
                 await agent.start_task(user_message)
 
             while True:
@@ -75,7 +203,7 @@ class ComputerUseAgent:
                 if self._session.signal == "pause_requested":
                     logger.info("Session paused by user request")
                     self._session.status = "Paused"
-                    await self._update_progress(status=self._session.status)
+                    self._update_progress(status=self._session.status)
                     break
 
                 if agent.requires_safety_check():
@@ -107,7 +235,19 @@ class ComputerUseAgent:
                     break
                 logger.info("Calling continue task")
                 await agent.continue_task(user_message)
-                await self._update_progress()
+                step = self._session.history_view.latest()
+                logger.info(
+                    f"Step {step['step']}: {step['action']} -> {step['next_action']}"
+                )
+                if (
+                    not agent.screen_changed
+                    and self._session.current_step.next_action
+                    == "computer_call_output"
+                ):
+                    # Nothing new to show, the next step's update includes this one
+                    logger.debug("Screen unchanged, skipping progress update")
+                    continue
+                self._update_progress()
         except Exception as e:
             logger.error(f"Error in CUA agent: {e}")
             traceback.print_exc()
@@ -128,105 +268,128 @@ class ComputerUseAgent:
         finally:
             # Remove the signal handler
             loop.remove_signal_handler(signal.SIGINT)
+            self._session.running = False
+            self._session.last_active = datetime.now()
+            if self._progress_shown:
+                # The last card stays in the chat, so its screenshot is inlined,
+                # a signed URL expires with the store
+                self._update_progress(self._progress_status, inline_screenshot=True)
+            # Let the last progress card reach Teams before the turn ends
+            await self._progress.flush(
+                self._progress_key, timeout=Config.PROGRESS_UPDATE_TIMEOUT
+            )
+            # The browser and the desktop lease live on with the session
+            if self._session.desktop is not None:
+                # A finished task's desktop can go to a queued session right away
+                current_step = self._session.current_step
+                await self._desktop_pool.checkin(
+                    self._session.desktop,
+                    finished=current_step is not None
+                    and current_step.next_action == "user_interaction",
+                )
 
     async def _build_cua_target(self) -> CUATarget:
-        width = 1024  # Default width
-        height = 768  # Default height
+        width = WIDTH
+        height = HEIGHT
 
         if Config.USE_BROWSER:
             if self._session.browser is None:
-                # Create new browser instance if none exists
-                self._session.browser = Browser(width=width, height=height)
+                # Check out a pre-warmed browser, it goes back when the session
+                # ends or expires after SESSION_IDLE_SECONDS
+                self._session.attach_browser(
+                    await self._browser_pool.acquire(), self._browser_pool.release
+                )
             # Initialize the browser (will reuse if already initialized)
             await self._session.browser.initialize()
-            return self._session.browser
+            target = self._session.browser
         else:
-            machine = Machine(
-                width=width,
-                height=height,
-                address=Config.VNC_ADDRESS,
-                password=Config.VNC_PASSWORD,
-            )
-            return ScaledCUATarget(width=width, height=height, target=machine)
+            pool = self._desktop_pool
+            if self._session.desktop is None and not pool.has_free_desktop:
+                await self._context.send_activity(
+                    "All desktops are busy, the task starts as soon as one is free."
+                )
+            # The session keeps its desktop between runs, until it ends or the
+            # lease sits idle long enough to be reclaimed
+            lease = await pool.acquire(self._session.desktop)
+            if lease is not self._session.desktop:
+                self._session.attach_desktop(lease, pool.release)
+            target = lease.machine
+        # Also wraps the browser, which is already at the target size, so that
+        # coordinates are translated when the model is sent smaller screenshots
+        return ScaledCUATarget(
+            width=width,
+            height=height,
+            target=target,
+            resample=RESAMPLE,
+            compress_level=Config.SCREENSHOT_PNG_COMPRESS_LEVEL,
+        )
 
-    async def _update_progress(self, status: str | None = None):
-        """Update the Teams message with a progress card."""
+    def _build_image_policy(self) -> ModelImagePolicy:
+        return ModelImagePolicy(
+            mode=Config.MODEL_IMAGE_POLICY,
+            low_detail=ModelImageSettings(
+                scale=Config.MODEL_IMAGE_LOW_DETAIL_SCALE,
+                image_format=Config.MODEL_IMAGE_LOW_DETAIL_FORMAT,
+                quality=Config.MODEL_IMAGE_JPEG_QUALITY,
+            ),
+        )
+
+    def _update_progress(
+        self, status: str | None = None, inline_screenshot: bool = False
+    ):
+        """
+        Update the Teams message with a progress card, without waiting for it.
+
+        The card is built right away, so it shows the session as it is now even
+        if the agent moves on before the card is sent.
+
+        Args:
+            status: The status shown on the card, also stored on the session
+            inline_screenshot: Inline the screenshot instead of serving it from the
+                screenshot store
+        """
         if status is not None:
             self._session.status = status
+        self._progress_shown = True
+        self._progress_status = status
 
-        # Map the current step's action to a string representation
-        action_str = "No action"
-        if self._session.current_step.call_action:
-            if isinstance(
-                self._session.current_step.call_action, ResponseFunctionToolCall
-            ):
-                # For dict actions (like navigate, go_back), use the name
-                action_str = self._session.current_step.call_action.name
-            elif self._session.current_step.call_action.type == "reasoning":
-                # concatenate the reasoning content
-                if self._session.current_step.call_action.content:
-                    content = "\n".join(
-                        [
-                            item.text
-                            for item in self._session.current_step.call_action.content
-                        ]
-                    )
-                    action_str = content if content else "Reasoning"
-                else:
-                    action_str = "Reasoning"
-            else:
-                # For standard Action type, use the type field
-                action_str = self._session.current_step.call_action.type
-
-        current_step: ProgressStepDict = {
-            "action": action_str,
-            "next_action": self._session.current_step.next_action,
-            "message": self._session.current_step.last_message,
-        }
-
-        # Convert history to the format expected by the card
-        history: list[ProgressStepDict] = []
-        for step in self._session.history:
-            action_str = "No action"
-            if step.call_action:
-                if isinstance(step.call_action, ResponseFunctionToolCall):
-                    action_str = step.call_action.name
-                elif step.call_action.type == "reasoning":
-                    # concatenate the reasoning content
-                    if step.call_action.content:
-                        content = "\n".join(
-                            [item.text for item in step.call_action.content]
-                        )
-                        action_str = content if content else "Reasoning"
-                    else:
-                        action_str = "Reasoning"
-                else:
-                    action_str = step.call_action.type
-
-            history.append(
-                {
-                    "action": action_str,
-                    "next_action": self._session.current_step.next_action,
-                    "message": step.last_message,
-                }
-            )
+        # Steps are rendered once and kept, each update only renders new ones
+        history = self._session.history_view.entries(
+            last=Config.PROGRESS_HISTORY_STEPS or None
+        )
+        current_step = history[-1] if history else None
+
+        screenshot_url = None
+        thumbnail = self._session.current_step.screenshot_thumbnail
+        if thumbnail:
+            # Fall back to inlining the screenshot if it cannot be served
+            screenshot_url = (
+                None
+                if inline_screenshot
+                else self._screenshot_store.publish(thumbnail.data, thumbnail.mime_type)
+            ) or thumbnail.data_url
 
+        self._progress.publish(
+            self._progress_key,
+            create_cua_progress_card(
+                screenshot_url=screenshot_url,
+                current_step=current_step,
+                history=history,
+                status=status,
+            ),
+            self._send_progress_card,
+        )
+
+    async def _send_progress_card(self, card: dict):
+        attachment = Attachment(
+            content_type="application/vnd.microsoft.card.adaptive", content=card
+        )
         if self._activity_id:
             activity = Activity(
                 id=self._activity_id,
                 type=ActivityTypes.message,
                 attachment_layout=AttachmentLayoutTypes.list,
-                attachments=[
-                    Attachment(
-                        content_type="application/vnd.microsoft.card.adaptive",
-                        content=create_cua_progress_card(
-                            screenshot=self._session.current_step.screenshot_base64,
-                            current_step=current_step,
-                            history=history,
-                            status=status,
-                        ),
-                    )
-                ],
+                attachments=[attachment],
             )
             await self._context.update_activity(activity=activity)
         else:
@@ -235,17 +398,7 @@ class ComputerUseAgent:
                 Activity(
                     type=ActivityTypes.message,
                     attachment_layout=AttachmentLayoutTypes.list,
-                    attachments=[
-                        Attachment(
-                            content_type="application/vnd.microsoft.card.adaptive",
-                            content=create_cua_progress_card(
-                                screenshot=self._session.current_step.screenshot_base64,
-                                current_step=current_step,
-                                history=history,
-                                status=status,
-                            ),
-                        )
-                    ],
+                    attachments=[attachment],
                 )
             )
             self._activity_id = sent_activity.id
@@ -1,14 +1,107 @@
+import asyncio
+import base64
+import hashlib
+import io
+import logging
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Awaitable, Callable
 
 from openai.types.responses.function_tool_param import FunctionToolParam
 from openai.types.responses.response_computer_tool_call import Action
 from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
+from PIL import Image
 
+if TYPE_CHECKING:
+    from cua.input_policy import ModelImageSettings
 
-class Screenshot(bytes):
-    """A screenshot is just bytes."""
+logger = logging.getLogger(__name__)
 
-    pass
+
+@dataclass(frozen=True)
+class ScrollResult:
+    """The requested and the actual distance of a scroll action, in pixels."""
+
+    requested: tuple[int, int]
+    scrolled: tuple[int, int]
+
+    @property
+    def stopped_early(self) -> bool:
+        """Whether the screen stopped moving before the requested distance."""
+        return any(
+            abs(scrolled) < abs(requested)
+            for scrolled, requested in zip(self.scrolled, self.requested)
+        )
+
+
+class Screenshot:
+    """
+    An encoded screenshot together with its dimensions and format.
+
+    The encoded bytes are held by reference, never copied. Derived forms such as the
+    base64 payload and the data URL are computed lazily, at most once per frame, and
+    shared by everything that holds the screenshot.
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        width: int | None = None,
+        height: int | None = None,
+        format: str = "png",
+    ):
+        self.data = data
+        self.format = format
+        if width is not None and height is not None:
+            self.size = (width, height)
+
+    @cached_property
+    def size(self) -> tuple[int, int]:
+        # Only the image header is read, the pixels are not decoded
+        return Image.open(io.BytesIO(self.data)).size
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format}"
+
+    @cached_property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    @cached_property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    @cached_property
+    def digest(self) -> bytes:
+        """A content digest, equal for identical screenshots."""
+        return hashlib.blake2b(self.data, digest_size=16).digest()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __bytes__(self) -> bytes:
+        return self.data
+
+    def __repr__(self) -> str:
+        return (
+            f"Screenshot(format={self.format}, bytes={len(self.data)}, "
+            f"digest={self.digest.hex()[:12]})"
+        )
+
+
+# An optional async hook that receives every captured screenshot, e.g. to keep
+# a copy on disk. It runs in the background and never delays the capture.
+ScreenshotArchiver = Callable[[Screenshot], Awaitable[None]]
 
 
 class CUATarget(ABC):
@@ -20,9 +113,12 @@ class CUATarget(ABC):
         """The environment of the target."""
         pass
 
+    archive_screenshot: ScreenshotArchiver | None = None
+
     def __init__(self, width: int = 1024, height: int = 768):
         self.width = width
         self.height = height
+        self._archive_tasks: set[asyncio.Task] = set()
 
     @property
     def additional_tool_schemas(self) -> list[FunctionToolParam]:
@@ -37,6 +133,42 @@ class CUATarget(ABC):
     @abstractmethod
     async def handle_tool_call(
         self, action: Action | ResponseFunctionToolCall
-    ) -> Screenshot | str | None:
-        """Handle a tool call and return the resulting screenshot."""
+    ) -> Screenshot | ScrollResult | str | None:
+        """
+        Handle a tool call.
+
+        Returns the resulting screenshot, the output of a function call, or for
+        targets that measure it, how far a scroll action actually scrolled.
+        """
         pass
+
+    async def encode_for_model(
+        self, screenshot: Screenshot, settings: "ModelImageSettings"
+    ) -> Screenshot:
+        """
+        Encode a screenshot as it is sent to the model.
+
+        Targets that cannot translate coordinates from a resized image send the
+        screenshot unchanged.
+        """
+        return screenshot
+
+    async def close(self) -> None:
+        """Release any resources held by the target."""
+        pass
+
+    def _archive(self, screenshot: Screenshot) -> None:
+        """Hand the screenshot to the archival hook without waiting for it."""
+        if self.archive_screenshot is None:
+            return
+
+        task = asyncio.create_task(self.archive_screenshot(screenshot))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._archive_tasks.add(task)
+
+        def on_done(task: asyncio.Task):
+            self._archive_tasks.discard(task)
+            if not task.cancelled() and task.exception():
+                logger.warning("Failed to archive screenshot: %s", task.exception())
+
+        task.add_done_callback(on_done)
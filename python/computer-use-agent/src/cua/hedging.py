@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """The latencies of recent calls, to tell when a call is running late."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Args:
+            window: How many recent latencies to keep
+            min_samples: How many latencies are needed before estimating percentiles
+        """
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float | None:
+        """The given percentile of recent latencies, None while there are too few."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = math.ceil(percentile / 100 * len(latencies)) - 1
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+
+class RequestHedger:
+    """
+    Sends a duplicate of a slow call, and keeps whichever finishes first.
+
+    A call is late once it has run longer than the given percentile of recent
+    latencies. The duplicate, or hedge, may go somewhere else than the first
+    call, e.g. a second deployment. The first successful result wins and the
+    other call is cancelled. Cancelling stops waiting for it, the server may
+    still finish and bill it, so hedges are limited by a budget: every call earns
+    a fraction of a hedge, which bounds hedges to that fraction of all calls.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget_ratio: float = 0.1,
+        max_burst: float = 2.0,
+        min_delay: float = 2.0,
+        tracker: LatencyTracker | None = None,
+    ):
+        """
+        Args:
+            percentile: The percentile of recent latencies after which to hedge
+            budget_ratio: The most hedges per call, over time
+            max_burst: The most hedges that can be saved up for a burst of slow calls
+            min_delay: The least time to wait before hedging, in seconds
+            tracker: Where latencies are recorded, a fresh tracker if not set
+        """
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.max_burst = max_burst
+        self.min_delay = min_delay
+        self.tracker = tracker or LatencyTracker()
+        self._budget = 0.0
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.skipped_for_budget = 0
+
+    def hedge_delay(self) -> float | None:
+        """How long to wait before hedging, None while latencies are unknown."""
+        latency = self.tracker.percentile(self.percentile)
+        if latency is None:
+            return None
+        return max(latency, self.min_delay)
+
+    async def run(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        hedge: Callable[[], Awaitable[T]] | None = None,
+    ) -> T:
+        """
+        Run an operation, hedging it if it runs late.
+
+        Args:
+            operation: The call to make
+            hedge: The duplicate call to make if it runs late, the same call if not set
+        """
+        self.calls += 1
+        self._budget = min(self._budget + self.budget_ratio, self.max_burst)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(operation())
+        delay = self.hedge_delay()
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    if self._budget >= 1:
+                        return await self._race(primary, hedge or operation, started)
+                    self.skipped_for_budget += 1
+            result = await primary
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    async def _race(
+        self,
+        primary: asyncio.Future,
+        hedge: Callable[[], Awaitable[T]],
+        started: float,
+    ) -> T:
+        self._budget -= 1
+        self.hedges += 1
+        logger.info(
+            f"Call running late after {time.monotonic() - started:.1f}s, hedging it"
+        )
+        secondary = asyncio.ensure_future(hedge())
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # The first call to succeed wins, a failure waits for the other
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    if task is secondary:
+                        self.hedges_won += 1
+                    self.tracker.record(time.monotonic() - started)
+                    logger.debug(
+                        f"Hedged call finished, {self.hedges_won}/{self.hedges} "
+                        f"hedges won over {self.calls} calls"
+                    )
+                    return task.result()
+            # Both failed, report the first call's error
+            return primary.result()
+        finally:
+            for task in (primary, secondary):
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,106 @@
+import logging
+from dataclasses import dataclass
+from typing import ClassVar
+
+from openai.types.responses.response_computer_tool_call import Action
+from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelImageSettings:
+    """How the screenshot handed to the model is encoded."""
+
+    FORMATS: ClassVar[tuple[str, ...]] = ("png", "jpeg")
+
+    # Fraction of the display size. The model still answers in display coordinates
+    scale: float = 1.0
+    image_format: str = "png"
+    # Only used for jpeg
+    quality: int = 85
+
+    def __post_init__(self) -> None:
+        if self.image_format not in self.FORMATS:
+            raise ValueError(
+                f"Unknown model image format {self.image_format!r}, "
+                f"expected one of {self.FORMATS}"
+            )
+
+    @property
+    def is_full(self) -> bool:
+        return self.scale == 1.0 and self.image_format == "png"
+
+
+FULL_DETAIL = ModelImageSettings()
+
+# Actions after which the model mostly orients itself on a new or moved page,
+# so a coarse view is enough.
+LOW_DETAIL_ACTIONS = {"navigate", "go_back", "scroll", "wait"}
+
+
+class ModelImagePolicy:
+    """
+    Picks the resolution and format of the screenshot sent to the model for each step.
+
+    Image tokens dominate request latency and cost, but most steps do not need full
+    fidelity. In "adaptive" mode the model gets a low detail image right after
+    navigating or scrolling, when it mostly orients itself, and the full screenshot
+    otherwise, so that the coordinates of precise clicks and drags are read off a
+    sharp image.
+    """
+
+    MODES = ("full", "adaptive", "low")
+
+    def __init__(
+        self,
+        mode: str = "full",
+        low_detail: ModelImageSettings = ModelImageSettings(
+            scale=0.5, image_format="jpeg", quality=70
+        ),
+        full_detail: ModelImageSettings = FULL_DETAIL,
+    ):
+        """
+        Args:
+            mode: One of "full", "adaptive" or "low"
+            low_detail: The settings used for steps that do not need full fidelity
+            full_detail: The settings used for all other steps
+        """
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown model image policy {mode!r}, expected one of {self.MODES}"
+            )
+        if not 0 < low_detail.scale <= 1 or not 0 < full_detail.scale <= 1:
+            raise ValueError("Model image scale must be in (0, 1]")
+        self.mode = mode
+        self.low_detail = low_detail
+        self.full_detail = full_detail
+
+    def settings_for(
+        self, actions: list[Action | ResponseFunctionToolCall]
+    ) -> ModelImageSettings:
+        """
+        Return the settings for the next screenshot.
+
+        Args:
+            actions: The actions performed since the previous screenshot, oldest first
+        """
+        if self.mode == "full":
+            return self.full_detail
+        if self.mode == "low":
+            return self.low_detail
+
+        action_names = [_action_name(action) for action in actions]
+        # An explicit screenshot request means the model wants a closer look
+        if action_names and action_names[-1] == "screenshot":
+            return self.full_detail
+        if any(name in LOW_DETAIL_ACTIONS for name in action_names):
+            logger.debug("Sending a low detail screenshot after %s", action_names)
+            return self.low_detail
+        return self.full_detail
+
+
+def _action_name(action: Action | ResponseFunctionToolCall) -> str | None:
+    if isinstance(action, ResponseFunctionToolCall):
+        return action.name
+    return getattr(action, "type", None)
@@ -1,11 +1,24 @@
 import io
 
-import PIL
 from openai.types.responses.function_tool_param import FunctionToolParam
 from openai.types.responses.response_computer_tool_call import Action
 from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
+from PIL import Image
 
-from cua.cua_target import CUATarget, Screenshot
+from cua.cua_target import CUATarget, Screenshot, ScrollResult
+from cua.input_policy import ModelImageSettings
+from cua.utils import run_in_image_pool
+
+
+def get_resample_filter(name: str) -> Image.Resampling:
+    """Look up a PIL resampling filter by name, e.g. "lanczos" or "bilinear"."""
+    try:
+        return Image.Resampling[name.upper()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown resampling filter {name!r}, expected one of "
+            f"{[f.name.lower() for f in Image.Resampling]}"
+        )
 
 
 class ScaledCUATarget(CUATarget):
@@ -15,20 +28,44 @@ class ScaledCUATarget(CUATarget):
     def environment(self) -> str:
         return self.target.environment
 
-    def __init__(self, width, height, target: CUATarget):
+    def __init__(
+        self,
+        width,
+        height,
+        target: CUATarget,
+        resample: Image.Resampling = Image.Resampling.LANCZOS,
+        compress_level: int = 1,
+    ):
+        """
+        Args:
+            width: The width of the screenshots handed to the model
+            height: The height of the screenshots handed to the model
+            target: The target to wrap
+            resample: The PIL resampling filter used when resizing
+            compress_level: The PNG compression level (0-9) of the scaled screenshots
+        """
         self.width = width
         self.height = height
         self.target = target
+        self.resample = resample
+        self.compress_level = compress_level
         self.screen_width = -1
         self.screen_height = -1
+        # Derived from the screen size, recomputed only when it changes
+        self._ratio = 1.0
+        self._scaled_size: tuple[int, int] = (width, height)
+        self._canvas: Image.Image | None = None
+        self._model_screenshot: (
+            tuple[tuple[bytes, ModelImageSettings], Screenshot] | None
+        ) = None
 
     async def take_screenshot(self) -> Screenshot:
         screenshot = await self.target.take_screenshot()
-        return self._scale_screenshot(screenshot)
+        return await run_in_image_pool(self._scale_screenshot, screenshot)
 
     async def handle_tool_call(
         self, action: Action | ResponseFunctionToolCall
-    ) -> Screenshot | None:
+    ) -> Screenshot | ScrollResult | str | None:
         # If it's a custom action, pass it through directly
         if isinstance(action, ResponseFunctionToolCall):
             return await self.target.handle_tool_call(action)
@@ -39,14 +76,37 @@ class ScaledCUATarget(CUATarget):
         if tool_call_result is None:
             return None
         if isinstance(tool_call_result, Screenshot):
-            return self._scale_screenshot(tool_call_result)
+            return await run_in_image_pool(self._scale_screenshot, tool_call_result)
+        # Scroll distances are in screen pixels, like the requested amounts
+        return tool_call_result
+
+    async def encode_for_model(
+        self, screenshot: Screenshot, settings: ModelImageSettings
+    ) -> Screenshot:
+        if settings.is_full:
+            model_screenshot = screenshot
+        else:
+            key = (screenshot.digest, settings)
+            if self._model_screenshot is not None and self._model_screenshot[0] == key:
+                model_screenshot = self._model_screenshot[1]
+            else:
+                model_screenshot = await run_in_image_pool(
+                    self._encode_for_model, screenshot, settings
+                )
+                self._model_screenshot = (key, model_screenshot)
+        # The computer tool still declares the target size, and the model answers
+        # in those coordinates whatever the size of the image it was sent
+        return model_screenshot
+
+    async def close(self) -> None:
+        await self.target.close()
 
     @property
     def additional_tool_schemas(self) -> list[FunctionToolParam]:
         return self.target.additional_tool_schemas
 
     def _adjust_action_args(self, action: Action) -> None:
-        if action.type in ("click", "double_click", "move"):
+        if action.type in ("click", "double_click", "move", "scroll"):
             action.x, action.y = self._point_to_screen_coords(action.x, action.y)
         elif action.type == "drag":
             for point in action.path:
@@ -54,25 +114,60 @@ class ScaledCUATarget(CUATarget):
                 point["x"] = x
                 point["y"] = y
 
+    def _update_screen_size(self, screen_width: int, screen_height: int) -> None:
+        if (screen_width, screen_height) == (self.screen_width, self.screen_height):
+            return
+        self.screen_width, self.screen_height = screen_width, screen_height
+        self._ratio = min(self.width / screen_width, self.height / screen_height)
+        self._scaled_size = (
+            int(screen_width * self._ratio),
+            int(screen_height * self._ratio),
+        )
+        # Letterboxing is only needed when the aspect ratios differ
+        self._canvas = (
+            None
+            if self._scaled_size == (self.width, self.height)
+            else Image.new("RGB", (self.width, self.height), (0, 0, 0))
+        )
+
     def _scale_screenshot(self, screenshot: Screenshot) -> Screenshot:
-        buffer = io.BytesIO(screenshot)
-        image = PIL.Image.open(buffer)
-        self.screen_width, self.screen_height = image.size
-        ratio = min(self.width / self.screen_width, self.height / self.screen_height)
-        new_width = int(self.screen_width * ratio)
-        new_height = int(self.screen_height * ratio)
-        resized_image = image.resize(
-            (new_width, new_height), PIL.Image.Resampling.LANCZOS
+        """Scale a screenshot to the target size. Blocking, run it in the image pool."""
+        # Opening is lazy, so the size is known before any pixel is decoded
+        image = Image.open(io.BytesIO(screenshot.data))
+        self._update_screen_size(*image.size)
+        if image.size == (self.width, self.height):
+            return screenshot
+
+        scaled_image = image.resize(self._scaled_size, self.resample)
+        if self._canvas is not None:
+            canvas = self._canvas.copy()
+            canvas.paste(scaled_image, (0, 0))
+            scaled_image = canvas
+        buffer = io.BytesIO()
+        scaled_image.save(buffer, format="PNG", compress_level=self.compress_level)
+        return Screenshot(buffer.getvalue(), width=self.width, height=self.height)
+
+    def _encode_for_model(
+        self, screenshot: Screenshot, settings: ModelImageSettings
+    ) -> Screenshot:
+        """Re-encode a screenshot for the model. Blocking, run it in the image pool."""
+        image = Image.open(io.BytesIO(screenshot.data))
+        size = (
+            max(1, round(image.width * settings.scale)),
+            max(1, round(image.height * settings.scale)),
         )
-        image = PIL.Image.new("RGB", (self.width, self.height), (0, 0, 0))
-        image.paste(resized_image, (0, 0))
+        if size != image.size:
+            image = image.resize(size, self.resample)
         buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-        return Screenshot(buffer.getvalue())
+        if settings.image_format == "jpeg":
+            image.convert("RGB").save(buffer, format="JPEG", quality=settings.quality)
+        else:
+            image.save(buffer, format="PNG", compress_level=self.compress_level)
+        return Screenshot(
+            buffer.getvalue(), width=size[0], height=size[1], format=settings.image_format
+        )
 
     def _point_to_screen_coords(self, x, y):
-        ratio = min(self.width / self.screen_width, self.height / self.screen_height)
-        x = x / ratio
-        y = y / ratio
+        x = x / self._ratio
+        y = y / self._ratio
         return int(x), int(y)
@@ -1,9 +1,27 @@
 import asyncio
+import email.utils
+import functools
 import logging
-from typing import Awaitable, Callable, Optional, TypeVar
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from openai import APIConnectionError, APITimeoutError
+
+from cua.cua_target import Screenshot, ScreenshotArchiver
 
 logger = logging.getLogger(__name__)
 
+# Image decoding, resizing and encoding is CPU bound. It runs on a shared pool so
+# that one session's screenshot work never stalls the event loop for the others.
+_image_executor = ThreadPoolExecutor(thread_name_prefix="cua-image")
+
 
 class MaxRetriesExceeded(Exception):
     """Exception raised when maximum retry attempts have been exceeded."""
@@ -17,51 +35,226 @@ class MaxRetriesExceeded(Exception):
 # Define a generic type variable for the return type of the operation
 T = TypeVar("T")
 
+# Status codes worth another attempt: timeouts, conflicts, throttling and
+# server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+@dataclass
+class RetryMetrics:
+    """Counts of the attempts and retries made under a retry policy."""
+
+    calls: int = 0
+    attempts: int = 0
+    retries: Counter = field(default_factory=Counter)
+    # Calls that ran out of attempts or time
+    exhausted: int = 0
+    total_delay: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.calls} calls, {self.attempts} attempts, "
+            f"retries {dict(self.retries)}, {self.exhausted} exhausted, "
+            f"{self.total_delay:.1f}s spent waiting"
+        )
+
+
+@dataclass
+class RetryPolicy:
+    """
+    When and how long to wait before retrying an operation.
+
+    Timeouts, connection errors, throttling and server errors are retried, with
+    exponential backoff and full jitter, so that throttled sessions spread out
+    instead of retrying in lockstep. A Retry-After from the server takes
+    precedence over the backoff. The deadline bounds the whole call, attempts and
+    waits included. Other errors are raised straight away.
+    """
+
+    # Attempts in total, the first one included
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    # Seconds a call may take in total, None for no limit
+    deadline: float | None = None
+    # The longest Retry-After to honour, longer ones give up instead
+    max_retry_after: float = 60.0
+    retryable_status_codes: frozenset[int] = RETRYABLE_STATUS_CODES
+    metrics: RetryMetrics = field(default_factory=RetryMetrics)
+
+    def classify(self, error: BaseException) -> str | None:
+        """The reason to retry after an error, None if it should not be retried."""
+        if isinstance(error, (APITimeoutError, asyncio.TimeoutError)):
+            return "timeout"
+        if isinstance(error, APIConnectionError):
+            return "connection"
+        status_code = getattr(error, "status_code", None)
+        if status_code in self.retryable_status_codes:
+            return "throttled" if status_code == 429 else f"status_{status_code}"
+        return None
+
+    def backoff(self, retry: int) -> float:
+        """A random delay before the given retry, counting from 1."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        return random.uniform(0, ceiling)
+
+    def delay_for(self, retry: int, error: BaseException | None = None) -> float:
+        """How long to wait before the given retry, honouring Retry-After."""
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            return retry_after
+        return self.backoff(retry)
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """The delay a server asked for, in seconds, if it asked for one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        # Retry-After may also be an HTTP date
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
 
 async def retry_async_operation(
     operation: Callable[[], Awaitable[T]],
     max_retries: int = 3,
     check_result: Optional[Callable[[T], bool]] = None,
     retry_delay: float = 0,
+    policy: RetryPolicy | None = None,
 ) -> T:
     """
     Generic retry function for async operations.
 
     Args:
         operation: An async callable to execute
-        max_retries: Maximum number of retry attempts
+        max_retries: Maximum number of retry attempts, ignored if a policy is given
         check_result: Optional function to validate the result and determine if retry is needed
                      Should return True if result is valid, False if retry is needed
-        retry_delay: Optional delay between retries in seconds
+        retry_delay: Delay between retries in seconds, ignored if a policy is given
+        policy: Which errors to retry, the backoff and the deadline
 
     Returns:
         The result of the operation with its original type preserved
 
     Raises:
         MaxRetriesExceeded: When the maximum number of retries is reached without a successful result
+        Exception: The last error of the operation, when it cannot be retried or
+            no attempts or time are left
     """
+    if policy is None:
+        policy = RetryPolicy(
+            max_retries=max_retries, base_delay=retry_delay, max_delay=retry_delay
+        )
+    metrics = policy.metrics
+    metrics.calls += 1
+    started = time.monotonic()
     retry_count = 0
 
-    while retry_count < max_retries:
-        result = await operation()
-
-        # If no check function provided or check passes, return the result
-        if check_result is None or check_result(result):
-            return result
+    while True:
+        remaining = (
+            policy.deadline - (time.monotonic() - started)
+            if policy.deadline is not None
+            else None
+        )
+        metrics.attempts += 1
+        error = None
+        try:
+            if remaining is not None:
+                result = await asyncio.wait_for(operation(), timeout=remaining)
+            else:
+                result = await operation()
+        except Exception as e:
+            reason = policy.classify(e)
+            if reason is None:
+                raise
+            error = e
+        else:
+            # If no check function provided or check passes, return the result
+            if check_result is None or check_result(result):
+                return result
+            reason = "invalid_result"
 
         # Otherwise, increment retry count and try again
         retry_count += 1
+        delay = policy.delay_for(retry_count, error)
+        elapsed = time.monotonic() - started
+        out_of_time = policy.deadline is not None and (
+            elapsed + delay >= policy.deadline
+        )
+        if (
+            retry_count >= policy.max_retries
+            or out_of_time
+            or delay > policy.max_retry_after
+        ):
+            metrics.exhausted += 1
+            logger.error(
+                f"Giving up after {retry_count} attempts in {elapsed:.1f}s "
+                f"({reason}), retry totals: {metrics.summary()}"
+            )
+            if error is not None:
+                raise error
+            raise MaxRetriesExceeded(policy.max_retries, result)
+
+        metrics.retries[reason] += 1
+        metrics.total_delay += delay
         logger.warning(
-            f"Operation failed check, retrying ({retry_count}/{max_retries})..."
+            f"Operation failed ({reason}), retrying in {delay:.2f}s "
+            f"({retry_count}/{policy.max_retries})..."
         )
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run_in_image_pool(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a CPU bound image function on the shared image worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _image_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+def archive_screenshots_to(directory: str) -> ScreenshotArchiver:
+    """
+    Create a screenshot archival hook that writes each capture to a directory.
+
+    Every capture gets its own file name, so concurrent sessions never overwrite
+    each other. The write happens in a worker thread to keep the event loop free.
+
+    Args:
+        directory: The directory to write the screenshots to, created if missing
+
+    Returns:
+        An async hook suitable for the `archive_screenshot` argument of a target
+    """
+    os.makedirs(directory, exist_ok=True)
 
-        if retry_delay > 0:
-            await asyncio.sleep(retry_delay)
+    def write(screenshot: Screenshot) -> None:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(directory, f"{timestamp}-{uuid.uuid4().hex[:8]}.png")
+        with open(path, "wb") as f:
+            f.write(screenshot.data)
 
-        if retry_count >= max_retries:
-            logger.error("Max retries reached")
-            raise MaxRetriesExceeded(max_retries, result)
+    async def archive(screenshot: Screenshot) -> None:
+        await asyncio.to_thread(write, screenshot)
 
-    # This line should never be reached due to the exception above
-    # but keeping it for type safety
-    return result
+    return archive
@@ -0,0 +1,162 @@
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from PIL import Image
+from vncdotool import api
+
+from cua.utils import run_in_image_pool
+
+logger = logging.getLogger(__name__)
+
+
+class FramebufferMirror:
+    """
+    Keeps a local copy of a VNC framebuffer up to date in the background.
+
+    The mirror holds its own connection and keeps requesting incremental
+    framebuffer updates, so the server only sends the regions that changed.
+    Taking a screenshot then becomes a copy of the current frame instead of a
+    full-screen refresh over the network.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        password: str | None = None,
+        update_timeout: float = 5.0,
+        compress_level: int = 1,
+    ) -> None:
+        """
+        Args:
+            address: The VNC server address
+            password: The VNC server password
+            update_timeout: How long to wait for an incremental update before asking again
+            compress_level: The PNG compression level (0-9) of the captured frames
+        """
+        self.address = address
+        self.password = password
+        self.update_timeout = update_timeout
+        self.compress_level = compress_level
+        # monotonic timestamps of the last update received and the last visible change
+        self.last_update: float | None = None
+        self.last_change: float | None = None
+        self._client = None
+        self._frame: Image.Image | None = None
+        self._frame_bytes: bytes | None = None
+        self._frame_version = 0
+        self._encoded: tuple[int, bytes] | None = None
+        self._first_frame = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # The mirror blocks on the server while the screen is idle, so it gets its
+        # own connection and thread instead of sharing the input connection's.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"vnc-mirror-{address}"
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def frame_version(self) -> int:
+        """A counter that increases every time the mirrored screen changes."""
+        return self._frame_version
+
+    def start(self) -> None:
+        """Start mirroring in the background. Does nothing if already running."""
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._mirror_loop())
+
+    async def stop(self) -> None:
+        """Stop mirroring and disconnect from the server."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            # Safe to call from any thread, it only schedules the disconnect
+            self._client.disconnect()
+            self._client = None
+        self._executor.shutdown(wait=False)
+
+    async def wait_for_frame(self, timeout: float) -> bool:
+        """Wait until the first frame is mirrored. Returns whether one is available."""
+        try:
+            await asyncio.wait_for(self._first_frame.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def capture(self) -> bytes | None:
+        """
+        Return the current frame as PNG bytes, or None if nothing is mirrored yet.
+        Each frame is encoded at most once, however often it is captured.
+        """
+        frame, version = self._frame, self._frame_version
+        if frame is None:
+            return None
+        if self._encoded is not None and self._encoded[0] == version:
+            return self._encoded[1]
+
+        encoded = await run_in_image_pool(self._encode, frame)
+        self._encoded = (version, encoded)
+        return encoded
+
+    def _encode(self, frame: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        frame.save(buffer, format="PNG", compress_level=self.compress_level)
+        return buffer.getvalue()
+
+    async def _mirror_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        incremental = False
+        try:
+            while True:
+                changed = await loop.run_in_executor(
+                    self._executor, self._refresh, incremental
+                )
+                # Only the first request needs the full screen
+                incremental = True
+                if changed:
+                    self._frame_version += 1
+                    self.last_change = time.monotonic()
+                    self._first_frame.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Framebuffer mirror for {self.address} stopped: {e}")
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            logger.info(f"Connecting framebuffer mirror to {self.address}")
+            self._client = api.connect(
+                self.address, password=self.password, timeout=self.update_timeout
+            )
+        return self._client
+
+    def _refresh(self, incremental: bool) -> bool:
+        """Wait for the next framebuffer update and return whether the frame changed."""
+        client = self._get_client()
+        try:
+            client.refreshScreen(incremental)
+        except TimeoutError:
+            # Servers only answer incremental requests once something changes
+            return False
+
+        self.last_update = time.monotonic()
+        # Updates only arrive in response to our requests, so the reactor thread
+        # leaves the screen alone until the next refresh.
+        frame = client.screen.copy()
+        frame_bytes = frame.tobytes()
+        if frame_bytes == self._frame_bytes:
+            return False
+        self._frame, self._frame_bytes = frame, frame_bytes
+        return True
@@ -4,8 +4,11 @@ import logging
 from openai.types.responses.response_computer_tool_call import Action
 from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
 
-from cua.cua_target import CUATarget, Screenshot
-from cua.vnc.vnc import VNCMachine
+from cua.cua_target import CUATarget, Screenshot, ScreenshotArchiver, ScrollResult
+from cua.vnc.framebuffer import FramebufferMirror
+from cua.vnc.motion import MotionPlanner
+from cua.vnc.settle import SettleDetector
+from cua.vnc.vnc import SCROLL_PIXELS_PER_CLICK, VNCMachine
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +20,158 @@ class Machine(CUATarget):
     def environment(self) -> str:
         return "linux"
 
-    def __init__(self, width=1024, height=768, address=None, password=None):
+    def __init__(
+        self,
+        width=1024,
+        height=768,
+        address=None,
+        password=None,
+        archive_screenshot: ScreenshotArchiver | None = None,
+        use_framebuffer_mirror: bool = False,
+        settle_window: float | None = None,
+        settle_timeout: float = 3.0,
+        text_entry: str = "keys",
+        key_batch_size: int = 16,
+        key_batch_delay: float = 0.02,
+        motion: MotionPlanner | None = None,
+        scroll_burst_size: int = 0,
+        scroll_burst_delay: float = 0.15,
+        vnc_timeout: float | None = 60.0,
+    ):
+        """
+        Args:
+            settle_window: If set, actions return once the screen has been unchanged
+                for this many seconds instead of after fixed delays. This turns on
+                the framebuffer mirror, which tells when the screen changes
+            settle_timeout: The upper bound of a settle wait, in seconds
+            text_entry: "keys" to type one key at a time, "batched" to send keys in
+                batches, or "paste" to paste text through the clipboard where possible
+            key_batch_size: How many keys are sent at once when not typing per key
+            key_batch_delay: Pause between key batches, in seconds
+            motion: Plans the pointer events of mouse moves and drags
+            scroll_burst_size: If set, scroll with bursts of this many wheel clicks and
+                stop once the screen no longer moves, instead of pausing per click
+            scroll_burst_delay: How long to let a burst render before checking the
+                screen, when not waiting for the screen to settle
+            vnc_timeout: How long a VNC call waits for the server, in seconds
+        """
         super().__init__(width, height)
-        self.vnc = VNCMachine(address, password)
+        self.archive_screenshot = archive_screenshot
+        # Settling polls the screen every few milliseconds, which is only cheap
+        # with the mirror, a full screen refresh per poll would flood the link
+        use_framebuffer_mirror = use_framebuffer_mirror or settle_window is not None
+        self.framebuffer = (
+            FramebufferMirror(address, password) if use_framebuffer_mirror else None
+        )
+
+        vnc_options = {"motion": motion, "timeout": vnc_timeout}
+        if settle_window is not None:
+            # Input only needs minimal pacing, settling covers the screen updates
+            vnc_options.update(scroll_delay=0.02, pointer_delay=0.005, key_delay=0.01)
+        if text_entry != "keys":
+            vnc_options.update(
+                key_delay=key_batch_delay,
+                key_batch_size=key_batch_size,
+                paste_text=text_entry == "paste",
+            )
+        self.vnc = VNCMachine(address, password, **vnc_options)
+
+        self.scroll_burst_size = scroll_burst_size
+        self.scroll_burst_delay = scroll_burst_delay
+
+        self.settle: SettleDetector | None = None
+        if settle_window is not None:
+            self.settle = SettleDetector(
+                self._screen_state, stable_window=settle_window, timeout=settle_timeout
+            )
 
     async def take_screenshot(self) -> Screenshot:
-        image_path = "screenshot.png"
-        await self.vnc.screenshot(screenshot_name=image_path, keys=None)
-        with open(image_path, "rb") as image_file:
-            return Screenshot(image_file.read())
+        screenshot: bytes | None = None
+        if self.framebuffer is not None:
+            self.framebuffer.start()
+            if await self.framebuffer.wait_for_frame(timeout=10):
+                screenshot = await self.framebuffer.capture()
+            else:
+                logger.warning("Framebuffer mirror has no frame, capturing directly")
+        if screenshot is None:
+            screenshot = await self.vnc.screenshot(keys=None)
+
+        screenshot = Screenshot(screenshot)
+        self._archive(screenshot)
+        return screenshot
+
+    async def _screen_state(self) -> object:
+        # The mirror already tracks changes, polling its counter is free
+        if self.framebuffer is not None and self.framebuffer.is_running:
+            return self.framebuffer.frame_version
+        return await self.vnc.frame_digest()
+
+    async def _wait_for_settle(self) -> None:
+        if self.settle is None:
+            return
+        if self.framebuffer is not None:
+            self.framebuffer.start()
+        await self.settle.wait_for_settle()
+
+    async def _scroll(
+        self, position: tuple[int, int], horizontal: int, vertical: int
+    ) -> tuple[int, int]:
+        """Scroll and return how far the screen actually scrolled, in pixels."""
+        if not self.scroll_burst_size:
+            await self.vnc.scroll(
+                position=position, horizontal=horizontal, vertical=vertical
+            )
+            return horizontal, vertical
+
+        if self.framebuffer is not None:
+            self.framebuffer.start()
+        scrolled_vertical = await self._scroll_in_bursts(position, vertical, False)
+        scrolled_horizontal = await self._scroll_in_bursts(position, horizontal, True)
+        return scrolled_horizontal, scrolled_vertical
+
+    async def _scroll_in_bursts(
+        self, position: tuple[int, int], amount: int, horizontal: bool
+    ) -> int:
+        if amount == 0:
+            return 0
+        remaining = max(int(abs(amount) / SCROLL_PIXELS_PER_CLICK), 1)
+        direction = 1 if amount > 0 else -1
+        scrolled = 0
+        state = await self._screen_state()
+        while remaining > 0:
+            clicks = min(remaining, self.scroll_burst_size)
+            await self.vnc.scroll_burst(position, direction * clicks, horizontal)
+            remaining -= clicks
+
+            # Let the burst render, smooth scrolling animates over several frames
+            if self.settle is not None:
+                await self.settle.wait_for_settle()
+            else:
+                await asyncio.sleep(self.scroll_burst_delay)
+            new_state = await self._screen_state()
+            if new_state == state:
+                logger.debug("Screen stopped moving, the end of the scroll is reached")
+                break
+            state = new_state
+            scrolled += clicks
+        return int(direction * scrolled * SCROLL_PIXELS_PER_CLICK)
 
-    async def _take_action(self, action: Action) -> Screenshot | None:
+    async def is_healthy(self, timeout: float = 10.0) -> bool:
+        """Whether the desktop accepts a connection and sends its screen in time."""
+        try:
+            await asyncio.wait_for(self.vnc.frame_digest(), timeout)
+        except Exception as e:
+            logger.debug(f"Health check of {self.vnc.address} failed: {e}")
+            return False
+        return True
+
+    async def close(self) -> None:
+        if self.framebuffer is not None:
+            await self.framebuffer.stop()
+        await self.vnc.close()
+
+    async def _take_action(self, action: Action) -> Screenshot | ScrollResult | None:
+        result = None
         if action.type == "click":
             await self.vnc.mouse_click(
                 position=(action.x, action.y), action="click", button=1
@@ -51,25 +195,31 @@ class Machine(CUATarget):
                 position=(action.x, action.y),
             )
         elif action.type == "scroll":
-            await self.vnc.scroll(
+            scrolled = await self._scroll(
                 position=(action.x, action.y),
                 horizontal=action.scroll_x,
                 vertical=action.scroll_y,
             )
+            result = ScrollResult(
+                requested=(action.scroll_x, action.scroll_y), scrolled=scrolled
+            )
         elif action.type == "type":
             await self.vnc.type(
                 text=action.text,
             )
         elif action.type == "wait":
-            await asyncio.sleep(1)  # Default wait time of 1 second
+            if self.settle is None:
+                await asyncio.sleep(1)  # Default wait time of 1 second
         elif action.type == "screenshot":
             return await self.take_screenshot()
         else:
             raise ValueError(f"Invalid action: {action.type}")
+        await self._wait_for_settle()
+        return result
 
     async def handle_tool_call(
         self, action: Action | ResponseFunctionToolCall
-    ) -> Screenshot | None:
+    ) -> Screenshot | ScrollResult | None:
         logger.info("Taking action: %s", action)
         if isinstance(action, ResponseFunctionToolCall):
             raise ValueError("Machine does not support additional action types")
@@ -0,0 +1,85 @@
+import math
+import random
+
+Point = tuple[int, int]
+
+
+class MotionPlanner:
+    """
+    Plans the intermediate pointer positions of mouse moves.
+
+    The number of events per move is capped, so long moves cost the same as short
+    ones. Profiles:
+      - instant: jump straight to the destination
+      - eased: a straight line with ease-in-out spacing
+      - human: an eased, slightly curved path, sent at a human-like pace
+    """
+
+    PROFILES = ("instant", "eased", "human")
+
+    def __init__(
+        self,
+        profile: str = "eased",
+        max_steps: int = 20,
+        pixels_per_step: float = 25.0,
+        step_delay: float = 0.008,
+    ) -> None:
+        """
+        Args:
+            profile: One of "instant", "eased" or "human"
+            max_steps: The most events a single move is split into
+            pixels_per_step: The distance covered by one event before the cap applies
+            step_delay: Pause between events of the human profile, in seconds
+        """
+        if profile not in self.PROFILES:
+            raise ValueError(
+                f"Unknown motion profile {profile!r}, expected one of {self.PROFILES}"
+            )
+        self.profile = profile
+        self.max_steps = max(max_steps, 1)
+        self.pixels_per_step = pixels_per_step
+        self.step_delay = step_delay
+
+    @property
+    def paced(self) -> bool:
+        """Whether events must be spaced out in time, instead of sent at once."""
+        return self.profile == "human" and self.step_delay > 0
+
+    def plan(self, start: Point, path: list[Point]) -> list[Point]:
+        """Return the positions to move through, from start along every point of path."""
+        positions: list[Point] = []
+        for end in path:
+            positions.extend(self._plan_segment(start, end))
+            start = end
+        return positions
+
+    def _plan_segment(self, start: Point, end: Point) -> list[Point]:
+        distance = math.dist(start, end)
+        if self.profile == "instant" or distance < 1:
+            return [end]
+
+        steps = min(self.max_steps, max(int(distance / self.pixels_per_step), 1))
+        (x1, y1), (x2, y2) = start, end
+        # A gentle arc, perpendicular to the direction of travel
+        bow = 0.0
+        if self.profile == "human":
+            bow = random.uniform(-0.08, 0.08) * distance
+        normal_x, normal_y = (y1 - y2) / distance, (x2 - x1) / distance
+
+        positions = []
+        for i in range(1, steps + 1):
+            t = _ease_in_out(i / steps)
+            offset = bow * math.sin(math.pi * t)
+            positions.append(
+                (
+                    round(x1 + (x2 - x1) * t + normal_x * offset),
+                    round(y1 + (y2 - y1) * t + normal_y * offset),
+                )
+            )
+        # Always land exactly on the destination
+        positions[-1] = end
+        return positions
+
+
+def _ease_in_out(t: float) -> float:
+    return 4 * t**3 if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2
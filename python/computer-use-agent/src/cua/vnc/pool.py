@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from cua.vnc.machine import Machine
+
+logger = logging.getLogger(__name__)
+
+
+class DesktopUnavailableError(Exception):
+    """Exception raised when no desktop became available before the timeout."""
+
+
+@dataclass(eq=False)
+class DesktopLease:
+    """A desktop held by a session, with a connection kept open for its lifetime."""
+
+    address: str
+    machine: Machine
+    # Whether a run is using the desktop right now, idle leases can be reclaimed
+    in_use: bool = True
+    # Whether the session's task is done, such leases are reclaimed right away
+    finished: bool = False
+    last_used: float = field(default_factory=time.monotonic)
+    released: bool = False
+
+
+class DesktopPool:
+    """
+    Leases the desktops of a VNC farm to sessions.
+
+    A session keeps its desktop, and the connection to it, between runs. When
+    every desktop is leased, new sessions queue until one is released, or until a
+    lease is reclaimed: leases of finished tasks right away, others once they have
+    been idle for longer than the idle timeout.
+    Desktops another session used are reset before they are leased again, and
+    the session that lost its desktop has to start its task over. Desktops are
+    health checked before they are leased, and unhealthy ones sit out for a while
+    before they are tried again.
+    """
+
+    def __init__(
+        self,
+        addresses: list[str],
+        machine_factory: Callable[[str], Machine],
+        idle_timeout: float = 900.0,
+        acquire_timeout: float = 300.0,
+        health_check_timeout: float = 10.0,
+        unhealthy_retry_after: float = 60.0,
+        reset_desktop: Callable[[str], Awaitable[None]] | None = None,
+    ) -> None:
+        """
+        Args:
+            addresses: The VNC addresses of the desktops
+            machine_factory: Creates the target for a desktop address
+            idle_timeout: Seconds after which an unused lease may be reclaimed, at
+                most half the acquire timeout so that queued sessions get one
+            acquire_timeout: How long a session waits in the queue for a desktop
+            health_check_timeout: How long a desktop may take to answer a health check
+            unhealthy_retry_after: Seconds before an unhealthy desktop is tried again
+            reset_desktop: Restores a desktop to a clean state, given its address
+        """
+        self.machine_factory = machine_factory
+        self.idle_timeout = min(idle_timeout, acquire_timeout / 2)
+        self.acquire_timeout = acquire_timeout
+        self.health_check_timeout = health_check_timeout
+        self.unhealthy_retry_after = unhealthy_retry_after
+        self.reset_desktop = reset_desktop
+        if reset_desktop is None:
+            logger.warning(
+                "Desktops are handed from one session to the next without a reset"
+            )
+        self._free: deque[str] = deque(addresses)
+        self._leases: dict[str, DesktopLease] = {}
+        # Unhealthy addresses and when to try them again
+        self._unhealthy: dict[str, float] = {}
+        # Addresses that were leased before, and need a reset
+        self._used: set[str] = set()
+        self._condition = asyncio.Condition()
+        self._waiting = 0
+        self._closing: set[asyncio.Task] = set()
+
+    @property
+    def size(self) -> int:
+        return len(self._free) + len(self._leases) + len(self._unhealthy)
+
+    @property
+    def has_free_desktop(self) -> bool:
+        """Whether a desktop can be leased without queueing."""
+        reclaimable = any(
+            lease.finished and not lease.in_use for lease in self._leases.values()
+        )
+        return (bool(self._free) or reclaimable) and not self._waiting
+
+    async def acquire(self, lease: DesktopLease | None = None) -> DesktopLease:
+        """
+        Lease a healthy desktop, waiting in the queue if all of them are busy.
+
+        Args:
+            lease: The session's current lease, returned as is if still valid
+
+        Raises:
+            DesktopUnavailableError: If no desktop is available before the timeout
+        """
+        if lease is not None and not lease.released:
+            lease.in_use = True
+            lease.finished = False
+            lease.last_used = time.monotonic()
+            return lease
+
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            address = await self._wait_for_address(deadline)
+            if not await self._reset(address):
+                self._unhealthy[address] = time.monotonic() + self.unhealthy_retry_after
+                continue
+            machine = self.machine_factory(address)
+            if await machine.is_healthy(self.health_check_timeout):
+                lease = DesktopLease(address, machine)
+                self._leases[address] = lease
+                logger.info(f"Leased desktop {address}")
+                return lease
+
+            logger.warning(f"Desktop {address} failed its health check")
+            await machine.close()
+            self._unhealthy[address] = time.monotonic() + self.unhealthy_retry_after
+
+    async def checkin(self, lease: DesktopLease, finished: bool = False) -> None:
+        """
+        Mark the end of a run. The session keeps the lease until it is reclaimed.
+
+        Args:
+            lease: The session's lease
+            finished: Whether the task is done, which makes the lease reclaimable
+                right away instead of after the idle timeout
+        """
+        lease.in_use = False
+        lease.finished = finished
+        lease.last_used = time.monotonic()
+        async with self._condition:
+            self._condition.notify()
+
+    async def release(self, lease: DesktopLease) -> None:
+        """Give a desktop back to the pool and close its connection."""
+        if lease.released:
+            return
+        lease.released = True
+        self._leases.pop(lease.address, None)
+        self._used.add(lease.address)
+        await lease.machine.close()
+        async with self._condition:
+            self._free.append(lease.address)
+            self._condition.notify()
+
+    async def close(self) -> None:
+        """Close the connections of every leased desktop."""
+        for lease in list(self._leases.values()):
+            await self.release(lease)
+
+    async def _wait_for_address(self, deadline: float) -> str:
+        async with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    address = self._take_address()
+                    if address is not None:
+                        return address
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DesktopUnavailableError(
+                            "All desktops are busy, please try again later"
+                        )
+                    # Wake up now and then, leases go idle and desktops recover
+                    # without anyone notifying
+                    try:
+                        await asyncio.wait_for(
+                            self._condition.wait(), timeout=min(remaining, 5.0)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiting -= 1
+
+    def _take_address(self) -> str | None:
+        now = time.monotonic()
+        for address, retry_at in list(self._unhealthy.items()):
+            if now >= retry_at:
+                del self._unhealthy[address]
+                self._free.append(address)
+
+        if self._free:
+            return self._free.popleft()
+
+        idle = [
+            lease
+            for lease in self._leases.values()
+            if not lease.in_use
+            and (lease.finished or now - lease.last_used >= self.idle_timeout)
+        ]
+        if not idle:
+            return None
+        # Finished tasks first, then the longest idle
+        lease = min(idle, key=lambda lease: (not lease.finished, lease.last_used))
+        logger.info(f"Reclaiming desktop {lease.address} from an idle session")
+        lease.released = True
+        del self._leases[lease.address]
+        self._used.add(lease.address)
+        # The connection is closed in the background, the desktop itself is free
+        task = asyncio.create_task(lease.machine.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        return lease.address
+
+    async def _reset(self, address: str) -> bool:
+        """Reset a desktop if another session used it. Returns whether it is ready."""
+        if address not in self._used or self.reset_desktop is None:
+            return True
+        try:
+            await self.reset_desktop(address)
+        except Exception as e:
+            logger.warning(f"Failed to reset desktop {address}: {e}")
+            return False
+        self._used.discard(address)
+        logger.info(f"Reset desktop {address}")
+        return True
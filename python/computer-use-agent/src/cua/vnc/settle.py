@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SettleDetector:
+    """
+    Waits for the screen to stop changing after an action.
+
+    The screen state is read through a probe that returns any comparable value,
+    e.g. the framebuffer mirror's frame version or a digest of the framebuffer.
+    The wait ends as soon as the probe has returned the same value for the whole
+    stable window, or when the timeout is reached, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[object]],
+        stable_window: float = 0.3,
+        timeout: float = 3.0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        """
+        Args:
+            probe: Returns a value that changes whenever the screen changes
+            stable_window: How long the screen must stay unchanged, in seconds
+            timeout: The upper bound of a wait, in seconds
+            poll_interval: How often the probe is called, in seconds
+        """
+        self.probe = probe
+        self.stable_window = stable_window
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    async def wait_for_settle(self, timeout: float | None = None) -> bool:
+        """
+        Wait until the screen is stable.
+
+        Args:
+            timeout: Overrides the detector's upper bound for this wait
+
+        Returns:
+            Whether the screen settled before the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        stable_since = start
+        state = await self.probe()
+        while True:
+            now = time.monotonic()
+            if now - stable_since >= self.stable_window:
+                logger.debug("Screen settled after %.2fs", now - start)
+                return True
+            if now - start >= timeout:
+                logger.debug("Screen still changing after %.2fs, giving up", timeout)
+                return False
+
+            await asyncio.sleep(self.poll_interval)
+            new_state = await self.probe()
+            if new_state != state:
+                state = new_state
+                stable_since = time.monotonic()
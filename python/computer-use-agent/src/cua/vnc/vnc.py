@@ -1,12 +1,19 @@
+import asyncio
+import functools
+import hashlib
+import io
 import logging
-import math
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Any, Iterator, Literal
+from typing import Any, Callable, Iterator, Literal, TypeVar
 
+from twisted.internet import defer, reactor, threads
 from vncdotool import api
 from vncdotool.client import VNCDoToolClient
 
+from cua.vnc.motion import MotionPlanner
+
 
 # Apply monkey patch to State.__getattr__ before importing vncdotool
 def _monkey_patch_state_getattr():
@@ -30,6 +37,8 @@ def _monkey_patch_state_getattr():
 # Initialize logger before using it in the patch function
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # Apply the patch before importing vncdotool
 _monkey_patch_state_getattr()
 
@@ -63,6 +72,13 @@ CUA_KEY_TO_VNC_KEY: dict[str, str] = {
 }
 
 
+# VNC mouse button constants - http://xahlee.info/linux/linux_x11_mouse_button_number.html
+BUTTON_SCROLL_UP = 4  # linux maapping to scroll up
+BUTTON_SCROLL_DOWN = 5  # linux maapping to scroll down
+# Roughly how far a single wheel click scrolls
+SCROLL_PIXELS_PER_CLICK = 50.0
+
+
 def cua_key_to_vnc_key(key: str) -> str:
     """
     Maps from our standard key definition to the VNC key definition
@@ -71,44 +87,229 @@ def cua_key_to_vnc_key(key: str) -> str:
     return CUA_KEY_TO_VNC_KEY.get(key) or key
 
 
+# Characters that are typed as their key rather than pasted
+TYPED_CHAR_TO_VNC_KEY = {"\n": "enter", "\t": "tab"}
+
+
+def split_text_for_paste(text: str) -> Iterator[tuple[str, bool]]:
+    """
+    Split text into runs that can be pasted and runs that must be typed.
+
+    VNC clipboard text is Latin-1, and newlines and tabs are meant as key presses,
+    so those characters are typed. Yields (run, pasteable) pairs in order.
+    """
+    run = ""
+    run_pasteable = True
+    for char in text:
+        pasteable = char not in TYPED_CHAR_TO_VNC_KEY and ord(char) < 256
+        if run and pasteable != run_pasteable:
+            yield run, run_pasteable
+            run = ""
+        run += char
+        run_pasteable = pasteable
+    if run:
+        yield run, run_pasteable
+
+
+def _call_with_protocol(
+    connected: defer.Deferred, func: Callable[[VNCDoToolClient], T]
+) -> defer.Deferred:
+    """
+    Call func with the connected protocol, once the connection is made.
+
+    Must run on the reactor thread. The deferred fires with the protocol instance
+    when the connection completes, calls chained onto it run in order after the
+    ones queued before them. Returns a deferred firing with the result of func.
+    """
+    result = defer.Deferred()
+
+    def call(protocol: VNCDoToolClient) -> defer.Deferred:
+        d = defer.maybeDeferred(func, protocol)
+        d.addCallbacks(result.callback, result.errback)
+        # Hand the protocol on to the next call in the chain
+        d.addBoth(lambda _: protocol)
+        return d
+
+    def fail(reason):
+        result.errback(reason)
+        return reason
+
+    connected.addCallbacks(call, fail)
+    return result
+
+
 class VNCMachine:
-    def __init__(self, address: str, password: str = None) -> None:
+    """
+    Drives a remote machine over VNC without blocking the event loop.
+
+    vncdotool's threaded API blocks the calling thread until the reactor answers,
+    and input pacing relies on short sleeps. Every interaction with the connection
+    therefore runs on a dedicated single worker thread, which keeps the event loop
+    free for other sessions and preserves the order of the commands we send.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        password: str = None,
+        scroll_delay: float = 0.5,
+        pointer_delay: float = 0.05,
+        key_delay: float = 0.06,
+        key_batch_size: int = 1,
+        paste_text: bool = False,
+        motion: MotionPlanner | None = None,
+        timeout: float | None = 60.0,
+    ) -> None:
+        """
+        Args:
+            address: The VNC server address
+            password: The VNC server password
+            scroll_delay: Pause after each scroll event, in seconds
+            pointer_delay: Pause after moving the pointer, in seconds
+            key_delay: Pause after each batch of typed characters, in seconds
+            key_batch_size: How many characters are typed in one go
+            paste_text: Enter text through the clipboard and ctrl+v where possible
+            motion: Plans the pointer events of mouse moves and drags
+            timeout: How long a call waits for the server, in seconds, before the
+                connection is given up on
+        """
         self.address = address
         self.mouse_last_position = None
         self.password = password
+        self.scroll_delay = scroll_delay
+        self.pointer_delay = pointer_delay
+        self.key_delay = key_delay
+        self.key_batch_size = max(key_batch_size, 1)
+        self.paste_text = paste_text
+        self.motion = motion or MotionPlanner()
+        self.timeout = timeout
         self.cached_client = None
         self._api = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"vnc-{address}"
+        )
 
-    async def _get_vnc_client(self) -> Any:
+    async def _run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function on this connection's worker thread."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        except TimeoutError:
+            # The client proxy would hand the late answer to the next call, so the
+            # connection cannot be trusted anymore, the next call reconnects
+            logger.warning(f"VNC call to {self.address} timed out, reconnecting")
+            client, self.cached_client = self.cached_client, None
+            if client is not None:
+                await self._disconnect(client)
+            raise
+
+    def _get_vnc_client(self) -> Any:
         """
         Return the VNC client connected to this machine.
+        Must be called from the connection's worker thread.
         """
         if self.cached_client:
             return self.cached_client
         try:
-            logger.info(
-                f"Connecting to vnc client with address: {self.address} and password: {self.password}"
+            logger.info(f"Connecting to vnc client with address: {self.address}")
+            self.cached_client = api.connect(
+                self.address, password=self.password, timeout=self.timeout
             )
-            self.cached_client = api.connect(self.address, password=self.password)
         except Exception as e:
             logger.error(f"Error connecting to VNC: {e}")
             raise e
         return self.cached_client
 
+    async def close(self) -> None:
+        """Disconnect from the machine and stop the worker thread."""
+        client, self.cached_client = self.cached_client, None
+        if client is not None:
+            await self._disconnect(client)
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    async def _disconnect(client: Any, wait: float = 5.0) -> None:
+        """
+        Disconnect a client, waiting for at most the given seconds.
+
+        This does not go through the worker thread, which may still be stuck in a
+        call. The disconnect is chained onto the connection, so a connection that
+        is still being made is closed as soon as it completes.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(client.disconnect))
+        await asyncio.wait({task}, timeout=wait)
+
     async def type(self, text: str) -> None:
-        client = await self._get_vnc_client()
+        await self._run(self._type, text)
+
+    def _type(self, text: str) -> None:
+        client = self._get_vnc_client()
         client.factory.force_caps = True
-        for char in text:
-            if char == "\n":
-                client.keyPress("enter")
-            elif char == "\t":
-                client.keyPress("tab")
+        if not self.paste_text:
+            self._type_keys(text, client)
+            return
+
+        for run, pasteable in split_text_for_paste(text):
+            if pasteable:
+                self._paste(run, client)
             else:
-                client.keyPress(char)
-            time.sleep(0.06)
+                self._type_keys(run, client)
+
+    def _type_keys(self, text: str, client: VNCDoToolClient) -> None:
+        keys = [TYPED_CHAR_TO_VNC_KEY.get(char, char) for char in text]
+        for start in range(0, len(keys), self.key_batch_size):
+            batch = keys[start : start + self.key_batch_size]
+            if len(batch) == 1:
+                client.keyPress(batch[0])
+            else:
+                self._press_keys_at_once(batch, client)
+            time.sleep(self.key_delay)
+
+    @staticmethod
+    def _press_keys_at_once(keys: list[str], client: VNCDoToolClient) -> None:
+        """
+        Send a batch of key presses in a single call into the reactor thread.
+
+        Going through the client proxy costs a round trip to the reactor for every
+        key, which dominates the time spent typing.
+        """
+
+        def press_all(protocol: VNCDoToolClient) -> None:
+            for key in keys:
+                protocol.keyPress(key)
+
+        VNCMachine._call_in_reactor(client, press_all)
+
+    @staticmethod
+    def _call_in_reactor(
+        client: VNCDoToolClient, func: Callable[[VNCDoToolClient], T]
+    ) -> T:
+        """
+        Run func with the connected protocol on the reactor thread and wait for it.
+
+        The factory's protocol attribute is the protocol class, not the connection,
+        so func is chained onto the factory's deferred instead, like the client
+        proxy does with every call.
+        """
+        return threads.blockingCallFromThread(
+            reactor, _call_with_protocol, client.factory.deferred, func
+        )
+
+    def _paste(self, text: str, client: VNCDoToolClient) -> None:
+        # Sets the remote clipboard, the focused application pastes it from there
+        client.clientCutText(text)
+        time.sleep(self.key_delay)
+        with self.hold_keys(client, ["ctrl"]):
+            client.keyPress("v")
+        time.sleep(self.key_delay)
 
     async def multi_key_press(self, keys: list[str]) -> None:
-        client = await self._get_vnc_client()
+        await self._run(self._multi_key_press, keys)
+
+    def _multi_key_press(self, keys: list[str]) -> None:
+        client = self._get_vnc_client()
         with self.hold_keys(client, keys):
             pass
 
@@ -117,9 +318,14 @@ class VNCMachine:
         position: tuple[int, int],
         keys: list[str] | None = None,
     ) -> None:
-        client = await self._get_vnc_client()
+        await self._run(self._move_mouse, position, keys)
+
+    def _move_mouse(
+        self, position: tuple[int, int], keys: list[str] | None = None
+    ) -> None:
+        client = self._get_vnc_client()
         with self.hold_keys(client, keys):
-            self._move_mouse_internal(position, client, 0.0002)
+            self._move_mouse_internal(position, client)
 
     async def mouse_click(
         self,
@@ -128,10 +334,19 @@ class VNCMachine:
         button: int = 1,
         keys: list[str] | None = None,
     ) -> None:
-        client = await self._get_vnc_client()
+        await self._run(self._mouse_click, position, action, button, keys)
+
+    def _mouse_click(
+        self,
+        position: tuple[int, int],
+        action: Literal["click", "double_click"],
+        button: int = 1,
+        keys: list[str] | None = None,
+    ) -> None:
+        client = self._get_vnc_client()
         with self.hold_keys(client, keys):
             self._move_mouse_internal(position, client)
-            time.sleep(0.05)  # wait for mouse to stabalize
+            time.sleep(self.pointer_delay)  # wait for mouse to stabalize
             if action == "click":
                 client.mousePress(button)
             elif action == "double_click":
@@ -139,13 +354,29 @@ class VNCMachine:
                 time.sleep(0.05)
                 client.mousePress(1)
 
-    async def screenshot(
-        self, keys: list[str] | None = None, screenshot_name="screenshot.png"
-    ) -> None:
-        client = await self._get_vnc_client()
+    async def screenshot(self, keys: list[str] | None = None) -> bytes:
+        """Capture the framebuffer and return it as PNG bytes."""
+        return await self._run(self._screenshot, keys)
+
+    def _screenshot(self, keys: list[str] | None = None) -> bytes:
+        client = self._get_vnc_client()
+        # vncdotool saves the capture through PIL, which infers the image
+        # format from the file name, so the in-memory buffer needs one.
+        buffer = io.BytesIO()
+        buffer.name = "screenshot.png"
         with self.hold_keys(client, keys or []):
             client.local_cursor = True
-            client.captureScreen(screenshot_name)
+            client.captureScreen(buffer)
+        return buffer.getvalue()
+
+    async def frame_digest(self) -> bytes:
+        """Refresh the framebuffer and return a digest of its pixels, unencoded."""
+        return await self._run(self._frame_digest)
+
+    def _frame_digest(self) -> bytes:
+        client = self._get_vnc_client()
+        client.refreshScreen(False)
+        return hashlib.blake2b(client.screen.tobytes(), digest_size=16).digest()
 
     async def drag_mouse(
         self,
@@ -155,19 +386,25 @@ class VNCMachine:
         if not path or len(path) < 2:
             raise ValueError("At least two points are required for a multi-point drag.")
 
-        client = await self._get_vnc_client()
+        await self._run(self._drag_mouse, path, keys)
+
+    def _drag_mouse(
+        self,
+        path: list[tuple[int, int]],
+        keys: list[str] | None = None,
+    ) -> None:
+        client = self._get_vnc_client()
         with self.hold_keys(client, keys):
             self._move_mouse_internal(path[0], client)
 
-            time.sleep(0.05)
+            time.sleep(self.pointer_delay)
             client.mouseDown(1)
-            time.sleep(0.05)
+            time.sleep(self.pointer_delay)
 
-            for point in path[1:]:
-                self._move_mouse_internal(point, client, delay=0.005)
+            self._move_mouse_along(path[1:], client)
 
             client.mouseUp(1)
-            time.sleep(0.05)
+            time.sleep(self.pointer_delay)
 
     async def scroll(
         self,
@@ -175,17 +412,22 @@ class VNCMachine:
         horizontal: int,
         vertical: int,
         keys: list[str] | None = None,
+    ) -> None:
+        await self._run(self._scroll_at, position, horizontal, vertical, keys)
+
+    def _scroll_at(
+        self,
+        position: tuple[int, int],
+        horizontal: int,
+        vertical: int,
+        keys: list[str] | None = None,
     ) -> None:
         x, y = position
         keys = keys or []
 
-        client = await self._get_vnc_client()
+        client = self._get_vnc_client()
         self._move_mouse_internal((x, y), client)
 
-        # VNC mouse button constants - http://xahlee.info/linux/linux_x11_mouse_button_number.html
-        BUTTON_SCROLL_UP = 4  # linux maapping to scroll up
-        BUTTON_SCROLL_DOWN = 5  # linux maapping to scroll down
-
         with self.hold_keys(client, keys):
             if vertical != 0:
                 direction = BUTTON_SCROLL_DOWN if vertical > 0 else BUTTON_SCROLL_UP
@@ -203,9 +445,10 @@ class VNCMachine:
         scroll_amount: int,
         direction: int,
         client: VNCDoToolClient,
-        delay: float = 0.5,
-        scroll_factor: float = 50.0,
+        delay: float | None = None,
+        scroll_factor: float = SCROLL_PIXELS_PER_CLICK,
     ) -> None:
+        delay = self.scroll_delay if delay is None else delay
         # Calculate number of scroll events
         num_events = max(int(abs(scroll_amount) / scroll_factor), 1)
 
@@ -213,26 +456,73 @@ class VNCMachine:
             client.mousePress(direction)
             time.sleep(delay)
 
-    def _move_mouse_internal(
+    async def scroll_burst(
         self,
         position: tuple[int, int],
-        client: VNCDoToolClient,
-        delay: float = 0.0002,
+        clicks: int,
+        horizontal: bool = False,
+        keys: list[str] | None = None,
+    ) -> None:
+        """
+        Send a burst of wheel clicks at once, without pausing between them.
+
+        Args:
+            position: Where to scroll
+            clicks: The number of wheel clicks, negative to scroll up or left
+            horizontal: Whether to scroll horizontally
+            keys: Keys to hold while scrolling
+        """
+        await self._run(self._scroll_burst, position, clicks, horizontal, keys)
+
+    def _scroll_burst(
+        self,
+        position: tuple[int, int],
+        clicks: int,
+        horizontal: bool = False,
+        keys: list[str] | None = None,
+    ) -> None:
+        client = self._get_vnc_client()
+        if position != self.mouse_last_position:
+            self._move_mouse_internal(position, client)
+
+        button = BUTTON_SCROLL_DOWN if clicks > 0 else BUTTON_SCROLL_UP
+
+        def press_all(protocol: VNCDoToolClient) -> None:
+            for _ in range(abs(clicks)):
+                protocol.mousePress(button)
+
+        # Shift turns the vertical wheel into a horizontal one
+        with self.hold_keys(client, (keys or []) + (["shift"] if horizontal else [])):
+            self._call_in_reactor(client, press_all)
+
+    def _move_mouse_internal(
+        self, position: tuple[int, int], client: VNCDoToolClient
+    ) -> None:
+        self._move_mouse_along([position], client)
+
+    def _move_mouse_along(
+        self, path: list[tuple[int, int]], client: VNCDoToolClient
     ) -> None:
-        if (
-            not hasattr(self, "mouse_last_position") or self.mouse_last_position is None
-        ):  # assuming some arbitrary initial position
+        """Move the pointer through every point of path, as the motion planner plans it."""
+        if self.mouse_last_position is None:
+            # assuming some arbitrary initial position
             self.mouse_last_position = (100, 100)
-        x1, y1 = self.mouse_last_position
-        x2, y2 = position
-        steps = max(int(math.hypot(x2 - x1, y2 - y1)), 1)
-        for i in range(1, steps + 1):
-            client.mouseMove(
-                int(x1 + (x2 - x1) * i / steps), int(y1 + (y2 - y1) * i / steps)
-            )
-            time.sleep(delay)
-        self.mouse_last_position = position
-        time.sleep(0.05)  # Wait for the mouse to settle
+        positions = self.motion.plan(self.mouse_last_position, path)
+
+        if self.motion.paced:
+            for x, y in positions:
+                client.mouseMove(x, y)
+                time.sleep(self.motion.step_delay)
+        else:
+            # The whole path is flushed in one call into the reactor thread
+
+            def move_all(protocol: VNCDoToolClient) -> None:
+                for x, y in positions:
+                    protocol.mouseMove(x, y)
+
+            self._call_in_reactor(client, move_all)
+        self.mouse_last_position = path[-1]
+        time.sleep(self.pointer_delay)  # Wait for the mouse to settle
 
     @staticmethod
     @contextmanager
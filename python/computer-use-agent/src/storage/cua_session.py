@@ -3,7 +3,7 @@ import typing
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Literal
+from typing import Awaitable, Callable, Literal
 
 from openai.types.responses.response import Response
 from openai.types.responses.response_computer_tool_call import (
@@ -15,7 +15,11 @@ from openai.types.responses.response_function_tool_call import (
 )
 from openai.types.responses.response_input_param import Reasoning
 
+from cards import ProgressStepDict
 from cua.browser.browser import Browser
+from cua.cua_target import Screenshot, ScrollResult
+from cua.vnc.pool import DesktopLease
+from thumbnails import Thumbnail
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -26,6 +30,63 @@ class CuaSessionHistory:
     call_action: Action | ResponseFunctionToolCall | None = None
     pending_safety_checks: list[PendingSafetyCheck] = field(default_factory=list)
     last_message: str = ""
+    next_action: str = ""
+
+
+def describe_action(
+    action: Action | ResponseFunctionToolCall | Reasoning | None,
+) -> str:
+    """A short, readable description of the action taken in a step."""
+    if not action:
+        return "No action"
+    if isinstance(action, ResponseFunctionToolCall):
+        # For functions (like navigate, go_back), use the name
+        return action.name
+    if action.type == "reasoning":
+        # Concatenate the reasoning content
+        content = "\n".join(item.text for item in action.content or [])
+        return content or "Reasoning"
+    # For standard Action type, use the type field
+    return action.type
+
+
+class CuaSessionHistoryView:
+    """
+    The steps of a session as progress card entries.
+
+    Every step is rendered once, the first time it is asked for, so each update
+    only renders the steps added since the last one.
+    """
+
+    def __init__(self, history: list[CuaSessionHistory]):
+        self._history = history
+        self._entries: list[ProgressStepDict] = []
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def entries(self, last: int | None = None) -> list[ProgressStepDict]:
+        """
+        The rendered steps, oldest first.
+
+        Args:
+            last: Only the given number of most recent steps, all of them if not set
+        """
+        for step in self._history[len(self._entries) :]:
+            self._entries.append(
+                {
+                    "step": len(self._entries) + 1,
+                    "action": describe_action(step.call_action),
+                    "next_action": step.next_action,
+                    "message": step.last_message,
+                }
+            )
+        return self._entries[-last:] if last else list(self._entries)
+
+    def latest(self) -> ProgressStepDict | None:
+        """The most recent step, if there is one."""
+        entries = self.entries(last=1)
+        return entries[0] if entries else None
 
 
 class CuaSessionStepState:
@@ -40,15 +101,24 @@ class CuaSessionStepState:
     pending_safety_checks: list[PendingSafetyCheck] = []
     last_message: str = ""
     response: Response
-    screenshot_base64: str | None = None
+    screenshot: Screenshot | None = None
+    screenshot_thumbnail: Thumbnail | None = None
+    # How far the step's scroll action actually scrolled, if the target measured it
+    scrolled: ScrollResult | None = None
 
-    def __init__(self, response: Response, screenshot_base64: str | None = None):
+    def __init__(
+        self,
+        response: Response,
+        screenshot: Screenshot | None = None,
+        screenshot_thumbnail: Thumbnail | None = None,
+    ):
         logger.debug("Initializing state with response: %s", response)
         assert response.status == "completed"
         self.response = response
         self.next_action = ""
         self.response_id = response.id
-        self.screenshot_base64 = screenshot_base64
+        self.screenshot = screenshot
+        self.screenshot_thumbnail = screenshot_thumbnail
         # If the item is a computer call, setting the next action and passing the action arguments.
         for item in response.output:
             if item.type == "function_call":  # Add handling for function type
@@ -71,32 +141,97 @@ class CuaSessionStepState:
                         if content.type == "output_text":
                             self.last_message += content.text
 
+    @property
+    def screenshot_base64(self) -> str | None:
+        return self.screenshot.base64 if self.screenshot else None
+
 
 class CuaSession:
     history: list[CuaSessionHistory]
+    history_view: CuaSessionHistoryView
     current_step: CuaSessionStepState | None
     id: str
     created_at: datetime
+    # When a run last ended, idle sessions are closed after a while
+    last_active: datetime
+    running: bool
     signal: Literal["acknowledged_pending_safety_checks", "pause_requested"] | None
     status: Literal["Running", "Paused", "Error"] | None
     browser: Browser | None
+    desktop: DesktopLease | None
+    # The task the session was started with, to start it over if needed
+    task: str | None
 
     def __init__(self):
         self.history = []
+        self.history_view = CuaSessionHistoryView(self.history)
         self.current_step = None
         self.id = str(uuid.uuid4())
         self.created_at = datetime.now()
+        self.last_active = self.created_at
+        self.running = False
         self.signal = None
         self.status = "Running"
         self.browser = None
+        self._release_browser: Callable[[Browser], Awaitable[None]] | None = None
+        self.desktop = None
+        self.task = None
+        self._release_desktop: Callable[[DesktopLease], Awaitable[None]] | None = None
+
+    def attach_browser(
+        self,
+        browser: Browser,
+        release: Callable[[Browser], Awaitable[None]] | None = None,
+    ) -> None:
+        """Keep a browser for the session, handed to release when the session ends."""
+        self.browser = browser
+        self._release_browser = release
+
+    @property
+    def desktop_reclaimed(self) -> bool:
+        """Whether the desktop was handed to another session between runs."""
+        return self.desktop is not None and self.desktop.released
 
-    def add_step(self, response: Response, screenshot_base64: str | None = None):
-        step = CuaSessionStepState(response, screenshot_base64=screenshot_base64)
+    def attach_desktop(
+        self,
+        desktop: DesktopLease,
+        release: Callable[[DesktopLease], Awaitable[None]],
+    ) -> None:
+        """Keep a desktop lease for the session, handed to release when it ends."""
+        self.desktop = desktop
+        self._release_desktop = release
+
+    async def close(self) -> None:
+        """Release the resources held by the session."""
+        desktop, self.desktop = self.desktop, None
+        if desktop is not None:
+            await self._release_desktop(desktop)
+
+        browser, self.browser = self.browser, None
+        if browser is None:
+            return
+        if self._release_browser is not None:
+            await self._release_browser(browser)
+        else:
+            await browser.cleanup()
+
+    def add_step(
+        self,
+        response: Response,
+        screenshot: Screenshot | None = None,
+        screenshot_thumbnail: Thumbnail | None = None,
+    ):
+        step = CuaSessionStepState(
+            response,
+            screenshot=screenshot,
+            screenshot_thumbnail=screenshot_thumbnail,
+        )
         self.history.append(
             CuaSessionHistory(
                 call_action=step.call_action,
                 pending_safety_checks=step.pending_safety_checks,
                 last_message=step.last_message,
+                next_action=step.next_action,
             )
         )
         self.current_step = step
@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class StoredScreenshot:
+    data: bytes
+    mime_type: str
+    expires_at: float
+
+
+class ScreenshotStore:
+    """
+    A content-addressed, in-memory store for the screenshots shown in cards.
+
+    Cards reference screenshots through short-lived signed URLs served by the bot,
+    instead of inlining them as data URIs. Entries expire after a TTL and the least
+    recently used ones are evicted when the memory budget is exceeded.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None,
+        secret: str | None = None,
+        ttl_seconds: int = 900,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        """
+        Args:
+            base_url: The public URL of the bot. Without it, no URLs can be handed out
+            secret: The key used to sign URLs, random per process if not set
+            ttl_seconds: How long a screenshot and its URLs stay valid
+            max_bytes: The memory budget for stored screenshots
+        """
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._secret = secret.encode() if secret else secrets.token_bytes(32)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._screenshots: OrderedDict[str, StoredScreenshot] = OrderedDict()
+        self._total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.base_url is not None
+
+    def publish(self, data: bytes, mime_type: str) -> str | None:
+        """
+        Store a screenshot and return a signed URL for it.
+
+        Returns None if the store is disabled, or if the screenshot alone exceeds
+        the memory budget and could not be kept.
+        """
+        if not self.enabled:
+            return None
+
+        digest = hashlib.sha256(data).hexdigest()
+        expires_at = time.time() + self.ttl_seconds
+        if digest in self._screenshots:
+            self._screenshots[digest].expires_at = expires_at
+            self._screenshots.move_to_end(digest)
+        else:
+            self._screenshots[digest] = StoredScreenshot(data, mime_type, expires_at)
+            self._total_bytes += len(data)
+        self._evict()
+        if digest not in self._screenshots:
+            return None
+
+        return self._signed_url(digest, int(expires_at))
+
+    def get(self, digest: str, expires: str, signature: str) -> StoredScreenshot | None:
+        """Return the screenshot for a signed URL, or None if it is invalid or gone."""
+        try:
+            expires_at = int(expires)
+        except (TypeError, ValueError):
+            return None
+        if expires_at < time.time() or not signature:
+            return None
+        if not hmac.compare_digest(signature, self._sign(digest, expires_at)):
+            return None
+
+        self._evict()
+        return self._screenshots.get(digest)
+
+    def _sign(self, digest: str, expires_at: int) -> str:
+        message = f"{digest}:{expires_at}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def _signed_url(self, digest: str, expires_at: int) -> str:
+        signature = self._sign(digest, expires_at)
+        return f"{self.base_url}/api/screenshots/{digest}?expires={expires_at}&sig={signature}"
+
+    def _evict(self) -> None:
+        # Publishing moves an entry to the end and every entry lives for the same TTL,
+        # so entries are ordered by both last use and expiry.
+        now = time.time()
+        while self._screenshots:
+            digest, screenshot = next(iter(self._screenshots.items()))
+            if screenshot.expires_at >= now and self._total_bytes <= self.max_bytes:
+                break
+            self._remove(digest)
+
+    def _remove(self, digest: str) -> None:
+        screenshot = self._screenshots.pop(digest)
+        self._total_bytes -= len(screenshot.data)
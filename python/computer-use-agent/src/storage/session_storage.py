@@ -1,5 +1,10 @@
+import logging
+from datetime import datetime, timedelta
+
 from storage.cua_session import CuaSession
 
+logger = logging.getLogger(__name__)
+
 
 class SessionStorage:
     """A simple in-memory storage for browser sessions."""
@@ -12,10 +17,27 @@ class SessionStorage:
         return self._sessions.get(user_id)
 
     async def set_session(self, user_id: str, session: CuaSession) -> None:
-        """Store a session for a user."""
+        """Store a session for a user, closing the session it replaces."""
+        previous = self._sessions.get(user_id)
         self._sessions[user_id] = session
+        if previous is not None and previous is not session:
+            await previous.close()
 
     async def delete_session(self, user_id: str) -> None:
         """Delete a user's session if it exists."""
         if user_id in self._sessions:
-            del self._sessions[user_id]
+            session = self._sessions.pop(user_id)
+            await session.close()
+
+    async def expire_idle(self, max_idle: timedelta) -> None:
+        """Close the sessions that have not run for longer than max_idle."""
+        now = datetime.now()
+        for user_id, session in list(self._sessions.items()):
+            if not session.running and now - session.last_active > max_idle:
+                logger.info(f"Ending session {session.id}, idle for too long")
+                await self.delete_session(user_id)
+
+    async def close(self) -> None:
+        """Close every session."""
+        for user_id in list(self._sessions):
+            await self.delete_session(user_id)
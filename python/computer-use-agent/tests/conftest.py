@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent runs from src, with its modules importable at the top level
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
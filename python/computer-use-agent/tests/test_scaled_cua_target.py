@@ -0,0 +1,80 @@
+import asyncio
+import io
+
+import pytest
+
+pytest.importorskip("openai")
+Image = pytest.importorskip("PIL.Image")
+
+from openai.types.responses.response_computer_tool_call import (  # noqa: E402
+    ActionClick,
+    ActionScroll,
+)
+
+from cua.cua_target import Screenshot  # noqa: E402
+from cua.input_policy import ModelImageSettings  # noqa: E402
+from cua.scaled_cua_target import ScaledCUATarget  # noqa: E402
+
+
+class FakeScreen:
+    """A screen twice the size the model is told about, recording actions."""
+
+    environment = "linux"
+    additional_tool_schemas = []
+
+    def __init__(self, width=2048, height=1536):
+        image = Image.new("RGB", (width, height), (255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        self.screenshot = Screenshot(buffer.getvalue(), width=width, height=height)
+        self.actions = []
+
+    async def take_screenshot(self):
+        return self.screenshot
+
+    async def handle_tool_call(self, action):
+        self.actions.append(action)
+        return None
+
+
+def run_step(target, action, settings):
+    async def step():
+        screenshot = await target.take_screenshot()
+        model_screenshot = await target.encode_for_model(screenshot, settings)
+        await target.handle_tool_call(action)
+        return model_screenshot
+
+    return asyncio.run(step())
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [ModelImageSettings(), ModelImageSettings(scale=0.5, image_format="jpeg")],
+)
+def test_click_in_display_coordinates_lands_on_the_screen(settings):
+    screen = FakeScreen()
+    target = ScaledCUATarget(1024, 768, screen)
+
+    # The model answers in the declared display size, whatever image it saw
+    model_screenshot = run_step(
+        target, ActionClick(type="click", button="left", x=512, y=384), settings
+    )
+
+    assert model_screenshot.width == 1024 * settings.scale
+    (click,) = screen.actions
+    assert (click.x, click.y) == (1024, 768)
+
+
+def test_scroll_position_is_translated():
+    screen = FakeScreen()
+    target = ScaledCUATarget(1024, 768, screen)
+
+    run_step(
+        target,
+        ActionScroll(type="scroll", x=100, y=50, scroll_x=0, scroll_y=300),
+        ModelImageSettings(scale=0.5, image_format="jpeg"),
+    )
+
+    (scroll,) = screen.actions
+    assert (scroll.x, scroll.y) == (200, 100)
+    assert (scroll.scroll_x, scroll.scroll_y) == (0, 300)
@@ -0,0 +1,28 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from cua.browser.stability import PageStabilityWaiter  # noqa: E402
+
+
+class BusyPage:
+    """A page whose main thread never gets to run scripts."""
+
+    def on(self, event, handler):
+        pass
+
+    async def evaluate(self, script):
+        await asyncio.Event().wait()
+
+
+def test_busy_page_gives_up_at_the_timeout():
+    waiter = PageStabilityWaiter(quiet_window=0.05, timeout=0.2)
+
+    start = time.monotonic()
+    settled = asyncio.run(waiter.wait_for_stable(BusyPage()))
+
+    assert not settled
+    assert time.monotonic() - start < 1.0
@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip("vncdotool")
+
+from twisted.internet import defer  # noqa: E402
+from twisted.python.failure import Failure  # noqa: E402
+
+from cua.vnc import vnc  # noqa: E402
+
+
+class FakeProtocol:
+    """Records what a connected VNC protocol was asked to send."""
+
+    def __init__(self):
+        self.sent = []
+
+    def keyPress(self, key):
+        self.sent.append(("key", key))
+        return self
+
+    def mouseMove(self, x, y):
+        self.sent.append(("move", x, y))
+        return self
+
+
+class FakeFactory:
+    # Like vncdotool's factory: the protocol attribute is the class, the
+    # deferred fires with the connected instance
+    protocol = FakeProtocol
+
+    def __init__(self, connected):
+        self.deferred = connected
+
+
+class FakeClient:
+    def __init__(self, connected):
+        self.factory = FakeFactory(connected)
+
+
+@pytest.fixture(autouse=True)
+def reactor_calls_inline(monkeypatch):
+    """Run reactor calls on the calling thread, the fakes never block."""
+
+    def blocking_call(reactor, func, *args):
+        results = []
+        func(*args).addBoth(results.append)
+        assert results, "the call did not complete"
+        if isinstance(results[0], Failure):
+            results[0].raiseException()
+        return results[0]
+
+    monkeypatch.setattr(vnc.threads, "blockingCallFromThread", blocking_call)
+
+
+def test_press_keys_at_once_uses_the_connected_protocol():
+    connection = FakeProtocol()
+    client = FakeClient(defer.succeed(connection))
+
+    vnc.VNCMachine._press_keys_at_once(["h", "i", "space"], client)
+
+    assert connection.sent == [("key", "h"), ("key", "i"), ("key", "space")]
+
+
+def test_calls_run_in_order_and_keep_the_connection():
+    connection = FakeProtocol()
+    client = FakeClient(defer.succeed(connection))
+
+    vnc.VNCMachine._press_keys_at_once(["a", "b"], client)
+    vnc.VNCMachine._call_in_reactor(client, lambda protocol: protocol.mouseMove(1, 2))
+    vnc.VNCMachine._press_keys_at_once(["c", "d"], client)
+
+    assert connection.sent == [
+        ("key", "a"),
+        ("key", "b"),
+        ("move", 1, 2),
+        ("key", "c"),
+        ("key", "d"),
+    ]
+
+
+def test_call_waits_for_the_connection():
+    connected = defer.Deferred()
+    connection = FakeProtocol()
+
+    result = vnc._call_with_protocol(
+        connected, lambda protocol: protocol.keyPress("x")
+    )
+    assert not result.called
+
+    connected.callback(connection)
+    assert result.called
+    assert connection.sent == [("key", "x")]
+
+
+def test_errors_reach_the_caller_without_breaking_the_connection():
+    connection = FakeProtocol()
+    client = FakeClient(defer.succeed(connection))
+
+    def fail(protocol):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        vnc.VNCMachine._call_in_reactor(client, fail)
+    vnc.VNCMachine._press_keys_at_once(["a", "b"], client)
+
+    assert connection.sent == [("key", "a"), ("key", "b")]
+
+
+def test_failed_connection_fails_the_call():
+    client = FakeClient(defer.fail(ConnectionRefusedError("refused")))
+
+    with pytest.raises(ConnectionRefusedError):
+        vnc.VNCMachine._press_keys_at_once(["a", "b"], client)
+    # The client's own disconnect handling consumes the failure
+    client.factory.deferred.addErrback(lambda _: None)
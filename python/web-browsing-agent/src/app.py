@@ -8,7 +8,7 @@ from http import HTTPStatus
 from aiohttp import web
 from botbuilder.core.integration import aiohttp_error_middleware
 
-from bot import bot_app
+from bot import bot_app, screenshot_store
 from config import Config
 
 routes = web.RouteTableDef()
@@ -24,6 +24,23 @@ async def on_messages(req: web.Request) -> web.Response:
     return web.Response(status=HTTPStatus.OK)
 
 
+@routes.get("/api/screenshots/{digest}")
+async def on_screenshot(req: web.Request) -> web.Response:
+    screenshot = screenshot_store.get(
+        req.match_info["digest"], req.query.get("expires"), req.query.get("sig")
+    )
+
+    if screenshot is None:
+        return web.Response(status=HTTPStatus.NOT_FOUND)
+
+    # Screenshots are content addressed, so they never change behind a URL
+    return web.Response(
+        body=screenshot.data,
+        content_type=screenshot.mime_type,
+        headers={"Cache-Control": f"private, max-age={Config.SCREENSHOT_TTL_SECONDS}"},
+    )
+
+
 app = web.Application(middlewares=[aiohttp_error_middleware])
 app.add_routes(routes)
 
@@ -12,6 +12,8 @@ from browser.browser_agent import MAX_EXECUTION_TIME_SECONDS, BrowserAgent
 from cards import create_in_progress_card
 from config import Config
 from middleware.session_middleware import SessionMiddleware
+from progress import ProgressPublisher
+from storage.screenshot_store import ScreenshotStore
 from storage.session import Session, SessionState
 from storage.session_storage import SessionStorage
 
@@ -19,6 +21,18 @@ config = Config()
 
 # Initialize application with session management
 session_storage = SessionStorage()
+screenshot_store = ScreenshotStore(
+    base_url=config.BOT_ENDPOINT,
+    secret=config.SCREENSHOT_URL_SECRET,
+    ttl_seconds=config.SCREENSHOT_TTL_SECONDS,
+    max_bytes=config.SCREENSHOT_STORE_MAX_BYTES,
+)
+progress_publisher = ProgressPublisher(
+    debounce=config.PROGRESS_DEBOUNCE,
+    min_interval=config.PROGRESS_MIN_INTERVAL,
+    timeout=config.PROGRESS_UPDATE_TIMEOUT,
+    max_backoff=config.PROGRESS_MAX_BACKOFF,
+)
 bot_app = Application(
     ApplicationOptions(
         bot_app_id=config.APP_ID,
@@ -53,7 +67,9 @@ async def run_agent(
     context: TurnContext, session: Session, query: str, activity_id: str
 ) -> str:
     """Run the browser agent with the given query."""
-    browser_agent = BrowserAgent(context, session, activity_id)
+    browser_agent = BrowserAgent(
+        context, session, activity_id, screenshot_store, progress_publisher
+    )
     result = await browser_agent.run(query)
     return result
 
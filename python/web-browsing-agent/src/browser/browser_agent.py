@@ -1,4 +1,6 @@
 import asyncio
+import base64
+import logging
 import os
 from typing import Callable, Coroutine
 
@@ -9,12 +11,22 @@ from browser_use.agent.views import AgentOutput
 from browser_use.browser.context import BrowserContext
 from browser_use.browser.views import BrowserState
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from playwright.async_api import Browser as PlaywrightBrowser
+from playwright.async_api import BrowserContext as PlaywrightBrowserContext
 
+from browser.routing import RequestRouter, get_routing_profile
 from cards import create_final_card, create_progress_card
 from config import Config
+from progress import ProgressPublisher
+from storage.screenshot_store import ScreenshotStore
 from storage.session import Session, SessionState, SessionStepState
+from thumbnails import Thumbnail, create_thumbnail, get_thumbnail_format
 
 MAX_EXECUTION_TIME_SECONDS = 600  # 10 minutes
+# Checked at startup, so that a typo fails before the first step
+THUMBNAIL_FORMAT = get_thumbnail_format(Config.THUMBNAIL_FORMAT)
+
+logger = logging.getLogger(__name__)
 
 
 class WrappedAgent(Agent):
@@ -42,17 +54,47 @@ class WrappedAgent(Agent):
                 last_model_output = model_outputs[-1]
                 await self.register_new_post_step_callback(last_model_output)
 
+
+class RoutedBrowserContext(BrowserContext):
+    """A browser context that applies a routing profile to the pages it opens."""
+
+    def __init__(self, *args, router: RequestRouter, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    async def _create_context(
+        self, browser: PlaywrightBrowser
+    ) -> PlaywrightBrowserContext:
+        context = await super()._create_context(browser)
+        await self.router.attach(context)
+        return context
+
+
 class BrowserAgent:
-    def __init__(self, context: TurnContext, session: Session, activity_id: str):
+    def __init__(
+        self,
+        context: TurnContext,
+        session: Session,
+        activity_id: str,
+        screenshot_store: ScreenshotStore,
+        progress_publisher: ProgressPublisher,
+    ):
         self.context = context
         self.session = session
         self.activity_id = activity_id
+        self.screenshot_store = screenshot_store
+        self.progress_publisher = progress_publisher
         self.browser = Browser(
             config=BrowserConfig(
                 headless=True if os.environ.get("IS_DOCKER_ENV", None) else False,
             )
         )
-        self.browser_context = BrowserContext(browser=self.browser)
+        self.router = RequestRouter(
+            get_routing_profile(Config.BROWSER_ROUTING_PROFILE)
+        )
+        self.browser_context = RoutedBrowserContext(
+            browser=self.browser, router=self.router
+        )
         self.llm = self._setup_llm()
         self.agent = None
 
@@ -75,6 +117,7 @@ class BrowserAgent:
         output: AgentOutput,
     ) -> None:
         screenshot_new = await self.browser_context.take_screenshot()
+        thumbnail = await self._create_thumbnail(screenshot_new)
         actions = (
             [action.model_dump_json(exclude_unset=True) for action in output.action]
             if output.action
@@ -87,6 +130,7 @@ class BrowserAgent:
             memory=output.current_state.memory,
             next_goal=output.current_state.next_goal,
             actions=actions,
+            thumbnail=thumbnail,
         )
 
         self.session.session_state.append(step)
@@ -108,7 +152,19 @@ class BrowserAgent:
                     }
                 )
 
-        # Update the Teams message with card
+        # Update the Teams message with card, coalesced with other updates
+        self.progress_publisher.publish(
+            self.activity_id,
+            create_progress_card(
+                screenshot_url=self._screenshot_url(thumbnail),
+                next_goal=step.next_goal,
+                action=step.action,
+                history_facts=history_facts,
+            ),
+            self._update_progress_card,
+        )
+
+    async def _update_progress_card(self, card: dict) -> None:
         activity = Activity(
             id=self.activity_id,
             type="message",
@@ -116,17 +172,34 @@ class BrowserAgent:
             attachments=[
                 Attachment(
                     content_type="application/vnd.microsoft.card.adaptive",
-                    content=create_progress_card(
-                        screenshot=step.screenshot,
-                        next_goal=step.next_goal,
-                        action=step.action,
-                        history_facts=history_facts,
-                    ),
+                    content=card,
                 )
             ],
         )
         await self.context.update_activity(activity=activity)
 
+    @staticmethod
+    async def _create_thumbnail(screenshot: str | None) -> Thumbnail | None:
+        """Create the card preview once per screenshot, off the event loop."""
+        if not screenshot:
+            return None
+        return await asyncio.to_thread(
+            create_thumbnail,
+            base64.b64decode(screenshot),
+            max_width=Config.THUMBNAIL_MAX_WIDTH,
+            max_bytes=Config.THUMBNAIL_MAX_BYTES,
+            image_format=THUMBNAIL_FORMAT,
+        )
+
+    def _screenshot_url(self, thumbnail: Thumbnail | None) -> str | None:
+        """Serve the preview from the screenshot store, or inline it if that is disabled."""
+        if not thumbnail:
+            return None
+        return (
+            self.screenshot_store.publish(thumbnail.data, thumbnail.mime_type)
+            or thumbnail.data_url
+        )
+
     def step_callback(
         self, state: BrowserState, output: AgentOutput, step_number: int
     ) -> None:
@@ -147,12 +220,14 @@ class BrowserAgent:
     async def _send_final_activity(
         self, message: str, include_screenshot: bool = True, override_title: str = None
     ) -> None:
-        # Get the last screenshot if available and if requested
-        last_screenshot = (
-            self.session.session_state[-1].screenshot
+        # Get the last screenshot and its preview if available and if requested
+        last_step = (
+            self.session.session_state[-1]
             if self.session.session_state and include_screenshot
             else None
         )
+        last_screenshot = last_step.screenshot if last_step else None
+        last_thumbnail = last_step.thumbnail if last_step else None
 
         # Transform agent history into simple facts list
         history_facts = None
@@ -172,24 +247,23 @@ class BrowserAgent:
                 )
 
         # First update the progress card
-        step = SessionStepState(action=message, screenshot=last_screenshot)
+        step = SessionStepState(
+            action=message, screenshot=last_screenshot, thumbnail=last_thumbnail
+        )
         self.session.session_state.append(step)
-        activity = Activity(
-            id=self.activity_id,
-            type="message",
-            attachment_layout=AttachmentLayoutTypes.list,
-            attachments=[
-                Attachment(
-                    content_type="application/vnd.microsoft.card.adaptive",
-                    content=create_progress_card(
-                        screenshot=None,
-                        action="The session concluded",
-                        history_facts=history_facts,
-                    ),
-                )
-            ],
+        # Replaces any step update still waiting, and goes out right away
+        self.progress_publisher.publish(
+            self.activity_id,
+            create_progress_card(
+                screenshot_url=None,
+                action="The session concluded",
+                history_facts=history_facts,
+            ),
+            self._update_progress_card,
+        )
+        await self.progress_publisher.flush(
+            self.activity_id, timeout=Config.PROGRESS_UPDATE_TIMEOUT
         )
-        await self.context.update_activity(activity=activity)
 
         # Then send a final results card
         await self.context.send_activity(
@@ -198,8 +272,12 @@ class BrowserAgent:
                 attachments=[
                     Attachment(
                         content_type="application/vnd.microsoft.card.adaptive",
+                        # The results stay in the chat, so the screenshot is
+                        # inlined, a signed URL expires with the store
                         content=create_final_card(
-                            message, last_screenshot, override_title
+                            message,
+                            last_thumbnail.data_url if last_thumbnail else None,
+                            override_title,
                         ),
                     )
                 ],
@@ -258,3 +336,6 @@ class BrowserAgent:
                 error_message, include_screenshot=False, override_title="🚨 Error"
             )
             return error_message
+        finally:
+            if self.router.profile.intercepts:
+                logger.info(f"Session {self.session.id} {self.router.summary()}")
@@ -0,0 +1,147 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Route
+
+# Well known advertising and analytics hosts, subdomains included
+TRACKER_DOMAINS = (
+    "adnxs.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "clarity.ms",
+    "criteo.com",
+    "doubleclick.net",
+    "google-analytics.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "hotjar.com",
+    "mixpanel.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "segment.io",
+    "taboola.com",
+)
+
+# Typical transfer sizes, used to estimate what blocked requests would have cost.
+# Blocked requests are never downloaded, so their real size is unknown.
+ESTIMATED_BYTES_BY_RESOURCE_TYPE = {
+    "font": 30_000,
+    "image": 40_000,
+    "media": 500_000,
+    "script": 25_000,
+    "stylesheet": 15_000,
+}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+# A transparent 1x1 GIF, keeps pages from reacting to broken images
+_STUB_IMAGE = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\x00\x00\x00!\xf9\x04\x01"
+    b"\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+@dataclass(frozen=True)
+class RoutingProfile:
+    """Which requests a browser context blocks or answers with a stub."""
+
+    name: str
+    blocked_resource_types: frozenset[str] = frozenset()
+    stubbed_resource_types: frozenset[str] = frozenset()
+    blocked_domains: tuple[str, ...] = ()
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(
+            self.blocked_resource_types
+            or self.stubbed_resource_types
+            or self.blocked_domains
+        )
+
+
+ROUTING_PROFILES = {
+    profile.name: profile
+    for profile in (
+        RoutingProfile("full"),
+        # Drops what the agent never needs: video, web fonts, ads and analytics
+        RoutingProfile(
+            "lean",
+            blocked_resource_types=frozenset({"media", "font", "ping"}),
+            blocked_domains=TRACKER_DOMAINS,
+        ),
+        # Pages keep their layout, but images are blank placeholders
+        RoutingProfile(
+            "text-only",
+            blocked_resource_types=frozenset({"media", "font", "ping"}),
+            stubbed_resource_types=frozenset({"image"}),
+            blocked_domains=TRACKER_DOMAINS,
+        ),
+    )
+}
+
+
+def get_routing_profile(name: str) -> RoutingProfile:
+    """Look up a routing profile by name: "full", "lean" or "text-only"."""
+    try:
+        return ROUTING_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown routing profile {name!r}, expected one of {list(ROUTING_PROFILES)}"
+        )
+
+
+@dataclass
+class RequestRouter:
+    """
+    Applies a routing profile to a browser context and counts what it saved.
+
+    The "full" profile does not intercept anything, so it adds no overhead.
+    """
+
+    profile: RoutingProfile
+    blocked: Counter = field(default_factory=Counter)
+    stubbed: Counter = field(default_factory=Counter)
+    estimated_bytes_saved: int = 0
+
+    async def attach(self, context: BrowserContext) -> None:
+        if self.profile.intercepts:
+            await context.route("**/*", self._handle)
+
+    def summary(self) -> str:
+        return (
+            f"routing profile {self.profile.name}: "
+            f"blocked {sum(self.blocked.values())} requests {dict(self.blocked)}, "
+            f"stubbed {sum(self.stubbed.values())} {dict(self.stubbed)}, "
+            f"saving an estimated {self.estimated_bytes_saved} bytes"
+        )
+
+    async def _handle(self, route: Route) -> None:
+        request = route.request
+        resource_type = request.resource_type
+        # Pages the agent navigates to always load
+        if resource_type == "document":
+            await route.continue_()
+        elif resource_type in self.profile.stubbed_resource_types:
+            self._record(self.stubbed, resource_type)
+            await route.fulfill(status=200, content_type="image/gif", body=_STUB_IMAGE)
+        elif resource_type in self.profile.blocked_resource_types or self._is_blocked(
+            request.url
+        ):
+            self._record(self.blocked, resource_type)
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def _record(self, counter: Counter, resource_type: str) -> None:
+        counter[resource_type] += 1
+        self.estimated_bytes_saved += ESTIMATED_BYTES_BY_RESOURCE_TYPE.get(
+            resource_type, DEFAULT_ESTIMATED_BYTES
+        )
+
+    def _is_blocked(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return any(
+            host == domain or host.endswith("." + domain)
+            for domain in self.profile.blocked_domains
+        )
@@ -25,7 +25,7 @@ def create_in_progress_card(session_id: str) -> dict:
     }
 
 def create_progress_card(
-    screenshot: str = None,
+    screenshot_url: str = None,
     next_goal: str = None,
     action: str = None,
     history_facts: list[dict] = None,
@@ -33,7 +33,7 @@ def create_progress_card(
     """Create a progress card showing the current state of the browsing session.
     
     Args:
-        screenshot: Base64 encoded screenshot
+        screenshot_url: URL of the screenshot preview, e.g. a data URL
         next_goal: Next goal to be achieved
         action: Current action being performed
         history_facts: List of dictionaries containing history facts with format:
@@ -46,11 +46,11 @@ def create_progress_card(
         "body": [],
     }
 
-    if screenshot:
+    if screenshot_url:
         card["body"].append(
             {
                 "type": "Image",
-                "url": f"data:image/png;base64,{screenshot}",
+                "url": screenshot_url,
                 "msTeams": {
                     "allowExpand": True,
                 },
@@ -138,7 +138,7 @@ def create_progress_card(
 
     return card
 
-def create_final_card(message: str, screenshot: str = None, override_title: str = None) -> dict:
+def create_final_card(message: str, screenshot_url: str = None, override_title: str = None) -> dict:
     """Create a final card showing the completion of the browsing session."""
     card = {
         "type": "AdaptiveCard",
@@ -171,12 +171,12 @@ def create_final_card(message: str, screenshot: str = None, override_title: str
         ],
     }
 
-    if screenshot:
+    if screenshot_url:
         card["body"].insert(
             1,
             {
                 "type": "Image",
-                "url": f"data:image/png;base64,{screenshot}",
+                "url": screenshot_url,
                 "msTeams": {
                     "allowExpand": True,
                 },
@@ -16,6 +16,14 @@ class Config:
     PORT = 3978
     APP_ID = os.environ.get("BOT_ID", "")
     APP_PASSWORD = os.environ.get("BOT_PASSWORD", "")
+    # The public URL of the bot. Card screenshots are served from it when set,
+    # otherwise they are inlined into the cards as data URIs.
+    BOT_ENDPOINT = os.environ.get("BOT_ENDPOINT", None)
+    SCREENSHOT_URL_SECRET = os.environ.get("SCREENSHOT_URL_SECRET", None)
+    SCREENSHOT_TTL_SECONDS = int(os.environ.get("SCREENSHOT_TTL_SECONDS", "900"))
+    SCREENSHOT_STORE_MAX_BYTES = int(
+        os.environ.get("SCREENSHOT_STORE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
 
     # LLM Configuration
     AZURE_OPENAI_API_BASE = os.environ.get("AZURE_OPENAI_ENDPOINT", None)
@@ -24,3 +32,24 @@ class Config:
     AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", None)
     OPENAI_MODEL_NAME = os.environ.get("OPENAI_MODEL_NAME", None)
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", None)
+
+    # Which requests the browser lets through: "full" loads everything, "lean"
+    # blocks video, web fonts, ads and analytics, and "text-only" also replaces
+    # images with blank placeholders.
+    BROWSER_ROUTING_PROFILE = os.environ.get("BROWSER_ROUTING_PROFILE", "full").lower()
+
+    # Screenshots shown in Teams cards are small previews of what the agent sees.
+    THUMBNAIL_MAX_WIDTH = int(os.environ.get("THUMBNAIL_MAX_WIDTH", "640"))
+    THUMBNAIL_MAX_BYTES = int(os.environ.get("THUMBNAIL_MAX_BYTES", "80000"))
+    # The preview format, "jpeg" or "webp"
+    THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "jpeg").lower()
+
+    # Progress cards are updated in the background. An update taking longer than
+    # PROGRESS_UPDATE_TIMEOUT seconds is dropped, the next one brings the card up
+    # to date. Updates are coalesced: a card waits PROGRESS_DEBOUNCE for a newer
+    # one, the same card is updated at most once per PROGRESS_MIN_INTERVAL, and
+    # throttled updates back off for up to PROGRESS_MAX_BACKOFF, all in seconds.
+    PROGRESS_UPDATE_TIMEOUT = float(os.environ.get("PROGRESS_UPDATE_TIMEOUT", "10"))
+    PROGRESS_DEBOUNCE = float(os.environ.get("PROGRESS_DEBOUNCE", "0.25"))
+    PROGRESS_MIN_INTERVAL = float(os.environ.get("PROGRESS_MIN_INTERVAL", "1.0"))
+    PROGRESS_MAX_BACKOFF = float(os.environ.get("PROGRESS_MAX_BACKOFF", "30"))
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+CardSender = Callable[[dict[str, Any]], Awaitable[None]]
+
+# How many times in a row a throttled card is retried before it is dropped
+MAX_THROTTLED_RETRIES = 5
+
+
+@dataclass(eq=False)
+class _Channel:
+    """The updates of a single card."""
+
+    pending: dict[str, Any] | None = None
+    send: CardSender | None = None
+    # When the first card still waiting was published
+    pending_since: float = 0.0
+    # No update goes out before this time
+    next_allowed: float = 0.0
+    throttled: int = 0
+    flushing: bool = False
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task | None = None
+
+
+def _status_code(error: Exception) -> int | None:
+    response = getattr(error, "response", None)
+    return getattr(error, "status_code", None) or getattr(
+        response, "status_code", None
+    )
+
+
+def _retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers["Retry-After"]) if headers else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ProgressPublisher:
+    """
+    Sends progress cards to Teams in the background, rate limited per card.
+
+    Publishing never waits for Teams. Each card, identified by a key such as its
+    activity id, is updated by its own background task. Cards published in quick
+    succession are coalesced: the task waits for the debounce delay, and never
+    updates the same card more often than the minimum interval, then sends only
+    the newest one. When Teams throttles an update, the card is retried after
+    the Retry-After delay or an exponential backoff. Other failed or slow
+    updates are logged and dropped, the next card brings Teams up to date.
+    Flushing skips the debounce delay, so the final state goes out promptly.
+    """
+
+    def __init__(
+        self,
+        debounce: float = 0.25,
+        min_interval: float = 1.0,
+        timeout: float = 10.0,
+        max_backoff: float = 30.0,
+    ):
+        """
+        Args:
+            debounce: How long to wait for a newer card before sending one, in seconds
+            min_interval: The least time between two updates of a card, in seconds
+            timeout: How long a single update may take, in seconds
+            max_backoff: The longest wait after Teams throttled an update, in seconds
+        """
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._channels: dict[str, _Channel] = {}
+
+    def publish(self, key: str, card: dict[str, Any], send: CardSender) -> None:
+        """
+        Queue a card, replacing any card for the same key not sent yet.
+
+        Args:
+            key: Identifies the card being updated, e.g. its activity id
+            card: The card content
+            send: Sends the card to Teams
+        """
+        self._prune()
+        channel = self._channels.setdefault(key, _Channel())
+        if channel.pending is None:
+            channel.pending_since = time.monotonic()
+        channel.pending = card
+        channel.send = send
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.create_task(self._run(key, channel))
+        else:
+            channel.wakeup.set()
+
+    async def flush(self, key: str, timeout: float | None = None) -> None:
+        """Send the newest card for a key now, waiting at most the timeout."""
+        channel = self._channels.get(key)
+        if channel is None or channel.task is None or channel.task.done():
+            return
+        channel.flushing = True
+        channel.wakeup.set()
+        await asyncio.wait({channel.task}, timeout=timeout)
+
+    async def _run(self, key: str, channel: _Channel) -> None:
+        try:
+            while channel.pending is not None:
+                now = time.monotonic()
+                ready_at = channel.next_allowed
+                if not channel.flushing:
+                    ready_at = max(ready_at, channel.pending_since + self.debounce)
+                if now < ready_at:
+                    channel.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(
+                            channel.wakeup.wait(), timeout=ready_at - now
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                card, channel.pending = channel.pending, None
+                await self._send(key, channel, card)
+        finally:
+            channel.flushing = False
+
+    async def _send(self, key: str, channel: _Channel, card: dict[str, Any]) -> None:
+        channel.next_allowed = time.monotonic() + self.min_interval
+        try:
+            await asyncio.wait_for(channel.send(card), timeout=self.timeout)
+        except Exception as e:
+            if _status_code(e) != 429:
+                logger.warning(f"Failed to update progress card {key}: {e}")
+                return
+            channel.throttled += 1
+            if channel.throttled > MAX_THROTTLED_RETRIES:
+                logger.warning(f"Progress card {key} throttled too often, dropping it")
+                channel.throttled = 0
+                return
+            delay = _retry_after(e)
+            if delay is None:
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.min_interval * 2**channel.throttled)
+                )
+            delay = min(delay, self.max_backoff)
+            logger.warning(f"Progress card {key} throttled, retrying in {delay:.1f}s")
+            channel.next_allowed = time.monotonic() + delay
+            # Try again, unless a newer card is already waiting
+            if channel.pending is None:
+                channel.pending = card
+                channel.pending_since = time.monotonic()
+            return
+        channel.throttled = 0
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key, channel in list(self._channels.items()):
+            idle = channel.task is None or channel.task.done()
+            if idle and channel.pending is None and now >= channel.next_allowed:
+                del self._channels[key]
@@ -4,6 +4,8 @@ from datetime import datetime
 from enum import Enum
 from typing import List, Optional
 
+from thumbnails import Thumbnail
+
 
 class SessionState(Enum):
     STARTED = "started"
@@ -19,6 +21,7 @@ class SessionStepState:
     memory: Optional[str] = None
     next_goal: Optional[str] = None
     actions: List[str] = None  # List of planned actions
+    thumbnail: Optional[Thumbnail] = None  # Card preview of the screenshot
 
 
 class Session:
@@ -0,0 +1,77 @@
+import base64
+import io
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Literal
+
+from PIL import Image
+
+# Quality steps tried in order until the preview fits the byte budget
+_QUALITY_STEPS = (80, 65, 50, 35)
+
+THUMBNAIL_FORMATS = ("jpeg", "webp")
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    """A small, size-capped preview of a screenshot for Teams cards."""
+
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+
+    @cached_property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+def get_thumbnail_format(name: str) -> Literal["jpeg", "webp"]:
+    """Look up a preview format by name: "jpeg" (or "jpg") or "webp"."""
+    image_format = name.lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in THUMBNAIL_FORMATS:
+        raise ValueError(
+            f"Unknown thumbnail format {name!r}, expected one of {THUMBNAIL_FORMATS}"
+        )
+    return image_format
+
+
+def create_thumbnail(
+    image: bytes,
+    max_width: int = 640,
+    max_bytes: int = 80_000,
+    image_format: Literal["jpeg", "webp"] = "jpeg",
+) -> Thumbnail:
+    """Create a card preview of a screenshot. Blocking, run it off the event loop.
+
+    Args:
+        image: The encoded screenshot
+        max_width: The maximum width of the preview, the aspect ratio is preserved
+        max_bytes: The size the encoded preview should stay under
+        image_format: The format of the preview
+    """
+    preview = Image.open(io.BytesIO(image)).convert("RGB")
+    preview.thumbnail((max_width, max_width), Image.Resampling.BILINEAR)
+
+    while True:
+        for quality in _QUALITY_STEPS:
+            buffer = io.BytesIO()
+            preview.save(buffer, format=image_format.upper(), quality=quality)
+            if buffer.tell() <= max_bytes:
+                break
+        # Still too large at the lowest quality, so shrink the preview instead
+        if buffer.tell() <= max_bytes or preview.width <= 160:
+            break
+        preview.thumbnail(
+            (preview.width * 3 // 4, preview.height * 3 // 4),
+            Image.Resampling.BILINEAR,
+        )
+
+    return Thumbnail(
+        data=buffer.getvalue(),
+        mime_type=f"image/{image_format}",
+        width=preview.width,
+        height=preview.height,
+    )